@@ -0,0 +1,237 @@
+import argparse
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from logic import *
+
+# Largest number of symbols each engine is run on
+LIMITS = {
+    "enumerate": 14,
+    "pruned": 40,
+    "gray": 16,
+    "compiled": 20,
+    "vectorized": 24,
+    "dpll": None,
+    "models": 40,
+    "session-dpll": None,
+}
+
+
+def knights(n, rng):
+    """
+    Knights and knaves puzzle with `n` inhabitants, each of whom makes
+    one statement about one or two of the others.
+    """
+    knight = [Symbol(f"{i} is a Knight") for i in range(n)]
+    knave = [Symbol(f"{i} is a Knave") for i in range(n)]
+    kind = [rng.random() < 0.5 for _ in range(n)]
+
+    def says(i, is_knight):
+        return knight[i] if is_knight else knave[i]
+
+    knowledge = []
+    for i in range(n):
+        # Every inhabitant is either a knight or a knave, but not both
+        knowledge.append(Or(knight[i], knave[i]))
+        knowledge.append(Not(And(knight[i], knave[i])))
+
+        # A true statement, which knaves turn into a false one
+        j, k = rng.randrange(n), rng.randrange(n)
+        if rng.random() < 0.5:
+            statement = says(j, kind[j])
+        else:
+            statement = Biconditional(says(j, True),
+                                      says(k, kind[j] == kind[k]))
+        if not kind[i]:
+            statement = Not(statement)
+        knowledge.append(Biconditional(knight[i], statement))
+    return And(*knowledge), knight + knave
+
+
+def mastermind(n, rng):
+    """
+    Mastermind with `n` colors in `n` positions, given two guesses
+    and how many positions each of them got right.
+    """
+    colors = [f"color{c}_" for c in range(n)]
+    symbol = {(c, i): Symbol(f"{colors[c]}{i}")
+              for c in range(n) for i in range(n)}
+    secret = list(range(n))
+    rng.shuffle(secret)
+
+    knowledge = []
+    for c in range(n):
+        # Each color has exactly one position
+        knowledge.append(Or(*[symbol[c, i] for i in range(n)]))
+        for i in range(n):
+            for j in range(n):
+                if i != j:
+                    knowledge.append(
+                        Implication(symbol[c, i], Not(symbol[c, j])))
+
+    # Only one color per position
+    for i in range(n):
+        for c1 in range(n):
+            for c2 in range(n):
+                if c1 != c2:
+                    knowledge.append(
+                        Implication(symbol[c1, i], Not(symbol[c2, i])))
+
+    # Each guess reveals how many of its positions are right
+    for _ in range(2):
+        guess = list(range(n))
+        rng.shuffle(guess)
+        right = sum(guess[i] == secret[i] for i in range(n))
+        knowledge.append(Or(*[
+            And(*[symbol[guess[i], i] if i in correct
+                  else Not(symbol[guess[i], i]) for i in range(n)])
+            for correct in itertools.combinations(range(n), right)
+        ]))
+    return And(*knowledge), list(symbol.values())
+
+
+def clue(n, rng):
+    """
+    Clue with `n` suspects, `n` rooms and `n` weapons, after some of the
+    cards not in the envelope have been seen.
+    """
+    groups = [
+        [Symbol(f"suspect{i}") for i in range(n)],
+        [Symbol(f"room{i}") for i in range(n)],
+        [Symbol(f"weapon{i}") for i in range(n)],
+    ]
+    envelope = [rng.choice(group) for group in groups]
+    others = [s for group in groups for s in group if s not in envelope]
+    rng.shuffle(others)
+
+    # There must be a person, room, and weapon
+    knowledge = [Or(*group) for group in groups]
+
+    # Cards seen in hands are not in the envelope
+    seen = others[:len(others) // 2]
+    knowledge.extend(Not(card) for card in seen)
+
+    # One of three cards is known not to be in the envelope
+    unseen = others[len(others) // 2:] + envelope
+    knowledge.append(Or(*[Not(card) for card in rng.sample(unseen, 3)]))
+    return And(*knowledge), [s for group in groups for s in group]
+
+
+FAMILIES = {
+    "knights": knights,
+    "mastermind": mastermind,
+    "clue": clue,
+}
+
+
+def answer(knowledge, queries, engine, stats):
+    """Answers every query with the given engine."""
+    if engine == "models":
+        return KnowledgeBase(knowledge).query_all(queries)
+    if engine == "session-dpll":
+        return KnowledgeBase(knowledge, engine="dpll").query_all(queries)
+    return {
+        query: (YES if model_check(knowledge, query, engine, stats=stats)
+                else NO if model_check(knowledge, Not(query), engine,
+                                       stats=stats)
+                else MAYBE)
+        for query in queries
+    }
+
+
+def run(family, size, engine, seed):
+    """Runs one benchmark and returns its measurements."""
+    knowledge, queries = FAMILIES[family](size, random.Random(seed))
+    stats = dict()
+    start = time.perf_counter()
+    answers = answer(knowledge, queries, engine, stats)
+    elapsed = time.perf_counter() - start
+
+    # Measure memory in a second run, since tracing slows everything down
+    tracemalloc.start()
+    answer(knowledge, queries, engine, dict())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "family": family,
+        "size": size,
+        "engine": engine,
+        "symbols": len(knowledge.symbols()),
+        "queries": len(queries),
+        "seconds": elapsed,
+        "queries_per_second": len(queries) / elapsed if elapsed else None,
+        "visited": stats.get("visited"),
+        "peak_bytes": peak,
+        "answers": sorted(
+            f"{query}: {value}" for query, value in answers.items()
+        ),
+    }
+
+
+def commit():
+    """Returns the current git commit, if there is one."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the logic engines on generated puzzles.")
+    parser.add_argument("--families", nargs="+", default=list(FAMILIES),
+                        choices=list(FAMILIES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[2, 3, 4])
+    parser.add_argument("--engines", nargs="+", default=list(LIMITS),
+                        choices=list(LIMITS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write JSON results to")
+    args = parser.parse_args()
+
+    results = []
+    for family in args.families:
+        for size in args.sizes:
+            for engine in args.engines:
+                knowledge, _ = FAMILIES[family](size, random.Random(args.seed))
+                limit = LIMITS[engine]
+                if limit is not None and len(knowledge.symbols()) > limit:
+                    continue
+                result = run(family, size, engine, args.seed)
+                results.append(result)
+                print(f"{family:>10} {size:>3} {engine:>12} "
+                      f"{result['symbols']:>4} symbols "
+                      f"{result['seconds']:>9.4f}s "
+                      f"{result['queries_per_second'] or 0:>10.1f} q/s "
+                      f"{result['peak_bytes'] / 1024:>9.1f} KiB "
+                      f"visited {result['visited']}")
+
+    # Engines must agree on every answer
+    for (family, size), group in itertools.groupby(
+        results, key=lambda result: (result["family"], result["size"])
+    ):
+        group = list(group)
+        if any(result["answers"] != group[0]["answers"] for result in group):
+            print(f"Engines disagree on {family} {size}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": commit(),
+                "python": platform.python_version(),
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,110 @@
+import gc
+import heapq
 import itertools
+import multiprocessing
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+YES = "YES"
+NO = "NO"
+MAYBE = "MAYBE"
 
 
 class Sentence():
+    """
+    Immutable logical sentence, with its hash computed once when it is
+    built. Symbols are interned, one object per name, and each caches
+    its negation, so the leaves of a knowledge base are shared and
+    compare by identity; larger sentences compare by structure.
+    """
+
+    __slots__ = ("_hash", "_symbols")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self is other or (
+            type(other) is type(self) and other._hash == self._hash
+            and other.operands() == self.operands()
+        )
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave some
+        symbols unassigned; returns None if the value is not yet known.
+        """
+        raise Exception("nothing to evaluate")
+
+    def operands(self):
+        """Returns a tuple of the sentence's immediate subsentences."""
+        return ()
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        if self._symbols is None:
+
+            # Collect names without recursing or caching them on operands
+            names = set()
+            seen = {id(self)}
+            stack = [self]
+            while stack:
+                sentence = stack.pop()
+                if sentence._symbols is not None:
+                    names |= sentence._symbols
+                    continue
+                for operand in sentence.operands():
+                    if id(operand) not in seen:
+                        seen.add(id(operand))
+                        stack.append(operand)
+            self._symbols = frozenset(names)
+        return self._symbols
+
+    def expression(self, index):
+        """Returns Python expression evaluating the sentence on bitmask `m`."""
+        raise Exception("nothing to compile")
+
+    def evaluate_array(self, columns):
+        """Evaluates the sentence over boolean arrays of many models."""
+        raise Exception("nothing to evaluate")
+
+    def tseitin(self, cnf):
+        """Returns a CNF literal equivalent to the sentence."""
+        raise Exception("nothing to encode")
+
+    @classmethod
+    def build(cls, operands, h=None):
+        """
+        Returns the sentence with the tuple `operands` as its operands,
+        which the caller has already checked are sentences. Its hash is
+        that of `(cls.word, operands)`, and may be passed in as `h`.
+        """
+        raise Exception("nothing to build")
+
+    @classmethod
+    def create(cls, h, symbols=None):
+        """
+        Creates a sentence with hash `h`, and its symbols if they are
+        known without looking through its operands.
+        """
+        sentence = object.__new__(cls)
+
+        # Hashed again so the hash is also that of the int it is, letting
+        # a sentence be hashed from its operands' hashes alone
+        sentence._hash = hash(h)
+        sentence._symbols = symbols
+        return sentence
 
     @classmethod
     def validate(cls, sentence):
@@ -34,7 +125,7 @@ class Sentence():
                         return False
                     count -= 1
             return count == 0
-        if not len(s) or s.isalpha() or (
+        if not len(s) or s.isalpha() or s in ("⊤", "⊥") or (
             s[0] == "(" and s[-1] == ")" and balanced(s[1:-1])
         ):
             return s
@@ -43,15 +134,29 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name", "negation")
 
-    def __init__(self, name):
-        self.name = name
+    # Every symbol, by name
+    interned = dict()
+
+    def __new__(cls, name):
+        self = Symbol.interned.get(name)
+        if self is None:
+            self = cls.create(hash(("symbol", name)), frozenset([name]))
+            self.name = name
+            self.negation = None
+            Symbol.interned[name] = self
+        return self
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            type(other) is Symbol and other.name == self.name
+        )
 
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    __hash__ = Sentence.__hash__
+
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -62,23 +167,53 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def expression(self, index):
+        try:
+            return f"(m & {1 << index[self.name]})"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in index")
+
+    def evaluate_array(self, columns):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def tseitin(self, cnf):
+        return cnf.variable(self.name)
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+    __slots__ = ("operand",)
+    word = "not"
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        return cls.build((operand,))
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    @classmethod
+    def build(cls, operands, h=None):
+        operand, = operands
+        if type(operand) is Symbol:
+            if operand.negation is None:
+                operand.negation = cls.create(
+                    hash((cls.word, (operand._hash,))), operand._symbols
+                )
+                operand.negation.operand = operand
+            return operand.negation
+        self = cls.create(hash((cls.word, operands)) if h is None else h)
+        self.operand = operand
+        return self
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +221,43 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
+    def operands(self):
+        return (self.operand,)
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def expression(self, index):
+        return f"(not {self.operand.expression(index)})"
+
+    def evaluate_array(self, columns):
+        return ~self.operand.evaluate_array(columns)
+
+    def tseitin(self, cnf):
+        return -cnf.encode(self.operand)
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+    word = "and"
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+        return cls.build(conjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+    @classmethod
+    def build(cls, operands, h=None):
+        self = cls.create(hash((cls.word, operands)) if h is None else h)
+        self.conjuncts = operands
+        return self
 
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def __reduce__(self):
+        return (And, self.conjuncts)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +266,82 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        """
+        Sentences are immutable, so a conjunction cannot grow. Collect
+        conjuncts in a list and build And(*conjuncts) once, or add facts
+        one at a time to a KnowledgeBase.
+        """
+        raise TypeError(
+            "And is immutable: build And(*conjuncts) from a list, "
+            "or use KnowledgeBase.add"
+        )
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    def operands(self):
+        return self.conjuncts
+
     def formula(self):
+        if not self.conjuncts:
+            return "⊤"
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def expression(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            conjunct.expression(index) for conjunct in self.conjuncts
+        ) + ")"
+
+    def evaluate_array(self, columns):
+        import numpy as np
+
+        # A NumPy bool, so that ~ on an empty conjunction is logical
+        result = np.True_
+        for conjunct in self.conjuncts:
+            result = result & conjunct.evaluate_array(columns)
+        return result
+
+    def tseitin(self, cnf):
+        literals = [cnf.encode(conjunct) for conjunct in self.conjuncts]
+        v = cnf.new_variable()
+        for literal in literals:
+            cnf.clauses.append([-v, literal])
+        cnf.clauses.append([v] + [-literal for literal in literals])
+        return v
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+    word = "or"
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        return cls.build(disjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+    @classmethod
+    def build(cls, operands, h=None):
+        self = cls.create(hash((cls.word, operands)) if h is None else h)
+        self.disjuncts = operands
+        return self
 
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    def __reduce__(self):
+        return (Or, self.disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +350,69 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    def operands(self):
+        return self.disjuncts
+
     def formula(self):
+        if not self.disjuncts:
+            return "⊥"
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def expression(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            disjunct.expression(index) for disjunct in self.disjuncts
+        ) + ")"
+
+    def evaluate_array(self, columns):
+        import numpy as np
+
+        # A NumPy bool, so that ~ on an empty disjunction is logical
+        result = np.False_
+        for disjunct in self.disjuncts:
+            result = result | disjunct.evaluate_array(columns)
+        return result
+
+    def tseitin(self, cnf):
+        literals = [cnf.encode(disjunct) for disjunct in self.disjuncts]
+        v = cnf.new_variable()
+        for literal in literals:
+            cnf.clauses.append([v, -literal])
+        cnf.clauses.append([-v] + literals)
+        return v
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+    word = "implies"
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        return cls.build((antecedent, consequent))
 
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+    @classmethod
+    def build(cls, operands, h=None):
+        self = cls.create(hash((cls.word, operands)) if h is None else h)
+        self.antecedent, self.consequent = operands
+        return self
 
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +421,59 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
+    def operands(self):
+        return (self.antecedent, self.consequent)
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def expression(self, index):
+        antecedent = self.antecedent.expression(index)
+        consequent = self.consequent.expression(index)
+        return f"(not {antecedent} or {consequent})"
+
+    def evaluate_array(self, columns):
+        return (~self.antecedent.evaluate_array(columns)
+                | self.consequent.evaluate_array(columns))
+
+    def tseitin(self, cnf):
+        a = cnf.encode(self.antecedent)
+        b = cnf.encode(self.consequent)
+        v = cnf.new_variable()
+        cnf.clauses.extend([[-v, -a, b], [v, a], [v, -b]])
+        return v
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+    word = "biconditional"
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        return cls.build((left, right))
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+    @classmethod
+    def build(cls, operands, h=None):
+        self = cls.create(hash((cls.word, operands)) if h is None else h)
+        self.left, self.right = operands
+        return self
 
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,20 +484,626 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
+    def operands(self):
+        return (self.left, self.right)
+
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
+    def expression(self, index):
+        left = self.left.expression(index)
+        right = self.right.expression(index)
+        return f"((not {left}) == (not {right}))"
+
+    def evaluate_array(self, columns):
+        return ~(self.left.evaluate_array(columns)
+                 ^ self.right.evaluate_array(columns))
+
+    def tseitin(self, cnf):
+        a = cnf.encode(self.left)
+        b = cnf.encode(self.right)
+        v = cnf.new_variable()
+        cnf.clauses.extend([[-v, -a, b], [-v, a, -b], [v, a, b], [v, -a, -b]])
+        return v
+
+
+class CNF():
+    """
+    Conjunctive normal form of sentences, built by Tseitin encoding.
+    Variables are positive integers and a literal is a variable or its
+    negation; each clause is a list of literals.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.clauses = []
+        self.count = 0
+        self.encoded = dict()
+
+    def new_variable(self):
+        """Returns a fresh variable."""
+        self.count += 1
+        return self.count
+
+    def variable(self, name):
+        """Returns the variable standing for the symbol called `name`."""
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def encode(self, sentence):
+        """Returns a literal equivalent to sentence, adding its definition."""
+        if sentence not in self.encoded:
+            self.encoded[sentence] = sentence.tseitin(self)
+        return self.encoded[sentence]
+
+    def add(self, sentence):
+        """Adds sentence as a fact, splitting top-level conjunctions."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        else:
+            self.clauses.append([self.encode(sentence)])
+
+
+class Solver():
+    """
+    CDCL satisfiability solver with two watched literals per clause,
+    first-UIP clause learning, activity-based branching and restarts.
+    Clauses may be added between calls to `solve`.
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.clauses = []
+        self.watches = dict()
+        self.value = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.heap = []
+        self.increment = 1.0
+        self.model = None
+        self.conflicts = 0
+
+    def reserve(self, count):
+        """Makes sure variables 1 to `count` exist."""
+        while len(self.value) <= count:
+            var = len(self.value)
+            self.value.append(0)
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.watches[var] = []
+            self.watches[-var] = []
+            heapq.heappush(self.heap, (0.0, var))
+
+    def literal_value(self, literal):
+        """Returns 1 if literal is true, -1 if false and 0 if unassigned."""
+        v = self.value[abs(literal)]
+        return v if literal > 0 else -v
+
+    def add_clause(self, literals):
+        """Adds a clause; returns False if the clauses became unsatisfiable."""
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        self.reserve(max((abs(literal) for literal in literals), default=0))
+
+        # Drop false and duplicate literals, skip satisfied clauses
+        clause = []
+        for literal in literals:
+            v = self.literal_value(literal)
+            if v == 1 or -literal in clause:
+                return True
+            if v == 0 and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause):
+        self.clauses.append(clause)
+        self.watches[-clause[0]].append(clause)
+        self.watches[-clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        var = abs(literal)
+        self.value[var] = 1 if literal > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """Propagates unit clauses; returns a conflicting clause or None."""
+        while self.qhead < len(self.trail):
+            literal = self.trail[self.qhead]
+            self.qhead += 1
+
+            # Visit clauses watching the literal that just became false
+            watching = self.watches[literal]
+            self.watches[literal] = kept = []
+            for i, clause in enumerate(watching):
+                if clause[0] == -literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.literal_value(clause[0]) == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    if self.literal_value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[-clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.literal_value(clause[0]) == -1:
+                        kept.extend(watching[i + 1:])
+                        self.qhead = len(self.trail)
+                        return clause
+                    self.assign(clause[0], clause)
+        return None
+
+    def analyze(self, conflict):
+        """Returns the first-UIP learned clause and the level to jump to."""
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        current = len(self.trail_lim)
+
+        while True:
+            for other in clause:
+                if other == literal:
+                    continue
+                var = abs(other)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == current:
+                        pending += 1
+                    else:
+                        learned.append(other)
+
+            # Walk back along the trail to the next marked literal
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[abs(literal)]
+
+        learned[0] = -literal
+        if len(learned) == 1:
+            return learned, 0
+
+        # Watch the literal from the highest remaining level second
+        k = max(range(1, len(learned)),
+                key=lambda k: self.level[abs(learned[k])])
+        learned[1], learned[k] = learned[k], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+        heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def cancel_until(self, level):
+        """Undoes all assignments above decision level `level`."""
+        if len(self.trail_lim) <= level:
+            return
+        for literal in self.trail[self.trail_lim[level]:]:
+            var = abs(literal)
+            self.value[var] = 0
+            self.reason[var] = None
+            self.phase[var] = literal > 0
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch(self):
+        """Returns the unassigned variable with highest activity, or None."""
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if self.value[var] == 0:
+                return var
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with all `assumptions`
+        true, storing a satisfying assignment in `self.model`.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.reserve(max((abs(literal) for literal in assumptions), default=0))
+        self.cancel_until(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.attach(learned)
+                    self.assign(learned[0], learned)
+                self.increment *= 1.05
+                continue
+
+            # Restart now and then, keeping learned clauses
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.cancel_until(0)
+                continue
+
+            # Decide assumptions first, then the most active variable
+            literal = None
+            while len(self.trail_lim) < len(assumptions):
+                assumption = assumptions[len(self.trail_lim)]
+                v = self.literal_value(assumption)
+                if v == -1:
+                    self.cancel_until(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if v == 0:
+                    literal = assumption
+                    break
+            if literal is None:
+                var = self.pick_branch()
+                if var is None:
+                    self.model = self.value[:]
+                    self.cancel_until(0)
+                    return True
+                literal = var if self.phase[var] else -var
+                self.trail_lim.append(len(self.trail))
+            self.assign(literal, None)
+
+
+class KnowledgeBase():
+    """
+    Session for asking many queries of one knowledge base.
+
+    With engine "models", the satisfying models of the knowledge base are
+    enumerated once as bitmasks and kept; with engine "dpll", one solver
+    is kept along with the clauses it has learned. Either way, facts can
+    be added later without starting over.
+    """
+
+    def __init__(self, knowledge=None, engine="models"):
+        if engine not in ("models", "dpll"):
+            raise ValueError(f"unknown engine {engine}")
+        self.engine = engine
+        self.sentences = []
+
+        # Satisfying models over the symbols seen so far
+        self.symbols = []
+        self.index = dict()
+        self.models = [0]
+
+        # Clauses handed to the solver so far
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.loaded = 0
+
+        if knowledge is not None:
+            self.add(knowledge)
+
+    def add(self, sentence):
+        """Adds sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+            return
+        self.sentences.append(sentence)
+
+        if self.engine == "dpll":
+            self.cnf.add(sentence)
+            self.load()
+            return
+
+        # Give new symbols the next free bits
+        base = len(self.symbols)
+        for symbol in sorted(sentence.symbols() - self.index.keys()):
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        extensions = [
+            extension << base
+            for extension in range(1 << (len(self.symbols) - base))
+        ]
+
+        # Keep only the extended models where sentence holds
+        holds = compile_sentence(sentence, self.index)
+        self.models = [
+            model | extension
+            for model in self.models
+            for extension in extensions
+            if holds(model | extension)
+        ]
+
+    def load(self):
+        """Hands clauses the solver has not seen yet to the solver."""
+        self.solver.reserve(self.cnf.count)
+        for clause in self.cnf.clauses[self.loaded:]:
+            self.solver.add_clause(clause)
+        self.loaded = len(self.cnf.clauses)
+
+    def entails(self, query):
+        """Checks if knowledge base entails query."""
+        if self.engine == "dpll":
+            literal = self.cnf.encode(query)
+            self.load()
+            return not self.solver.solve([-literal])
+
+        # Symbols unknown to the knowledge base may take either value
+        index = dict(self.index)
+        for symbol in sorted(query.symbols() - index.keys()):
+            index[symbol] = len(index)
+        extensions = [
+            extension << len(self.symbols)
+            for extension in range(1 << (len(index) - len(self.symbols)))
+        ]
+        holds = compile_sentence(query, index)
+        return all(
+            holds(model | extension)
+            for model in self.models
+            for extension in extensions
+        )
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def query(self, query):
+        """Returns YES, NO or MAYBE for whether query follows."""
+        if self.entails(query):
+            return YES
+        if self.entails(Not(query)):
+            return NO
+        return MAYBE
+
+    def query_all(self, queries):
+        """Returns a dictionary mapping each query to YES, NO or MAYBE."""
+        queries = list(queries)
+        if self.engine == "dpll":
+            return self.query_all_dpll(queries)
+
+        # Bits set in every model, and bits set in some model
+        always = ~0
+        ever = 0
+        for model in self.models:
+            always &= model
+            ever |= model
+
+        answers = dict()
+        for query in queries:
+            if not self.models:
+                answers[query] = YES
+            elif isinstance(query, Symbol) and query.name in self.index:
+                bit = 1 << self.index[query.name]
+                answers[query] = (YES if always & bit
+                                  else NO if not ever & bit
+                                  else MAYBE)
+            else:
+                answers[query] = self.query(query)
+        return answers
+
+    def query_all_dpll(self, queries):
+        """Answers queries, sharing every model found among all of them."""
+        literals = {query: self.cnf.encode(query) for query in queries}
+        self.load()
+
+        # Values each query has been seen to take in some model
+        seen = {query: set() for query in queries}
+
+        def record(model):
+            for query, literal in literals.items():
+                value = model[abs(literal)]
+                seen[query].add(value == 1 if literal > 0 else value == -1)
+
+        if not self.solver.solve():
+            return {query: YES for query in queries}
+        record(self.solver.model)
+
+        # Look for a model where each query takes the value not yet seen
+        for query, literal in literals.items():
+            for value in (True, False):
+                if value not in seen[query]:
+                    if self.solver.solve([literal if value else -literal]):
+                        record(self.solver.model)
+
+        answers = dict()
+        for query in queries:
+            if len(seen[query]) == 2:
+                answers[query] = MAYBE
+            else:
+                answers[query] = YES if True in seen[query] else NO
+        return answers
+
+
+def compile_sentence(sentence, index):
+    """
+    Compiles a sentence into a function of an integer bitmask `m`,
+    where bit `index[name]` of `m` holds the truth value of symbol `name`.
+    """
+    _, function = compile_lambda([sentence], index, "{0}")
+    return function
+
+
+def compile_lambda(sentences, index, template):
+    """
+    Compiles `template`, with each {i} standing for sentences[i], into a
+    function of bitmask `m`. Returns the function and its source.
+
+    Sentences are compiled as nested expressions, which short-circuit.
+    Sentences nested too deeply for Python's parser are instead compiled
+    as a flat sequence with one assignment per subsentence.
+    """
+    try:
+        source = "lambda m: " + template.format(
+            *[sentence.expression(index) for sentence in sentences]
+        )
+        code = compile(source, "<sentence>", "eval")
+    except (MemoryError, RecursionError, SyntaxError):
+        source = flat_source(sentences, index, template)
+        code = compile(source, "<sentence>", "eval")
+    return source, eval(code)
+
+
+def flat_source(sentences, index, template):
+    """
+    Returns the source of a function of bitmask `m` that evaluates every
+    subsentence once, operands first, each into its own variable, then
+    `template` on the variables of `sentences`.
+    """
+
+    # Number subsentences so that operands come before what uses them
+    names = dict()
+    steps = []
+    stack = [(sentence, False) for sentence in reversed(sentences)]
+    while stack:
+        sentence, expanded = stack.pop()
+        if sentence in names:
+            continue
+        if not expanded:
+            stack.append((sentence, True))
+            for operand in reversed(sentence.operands()):
+                if operand not in names:
+                    stack.append((operand, False))
+            continue
+
+        if isinstance(sentence, Symbol):
+            names[sentence] = sentence.expression(index)
+            continue
+        operands = [names[operand] for operand in sentence.operands()]
+        if isinstance(sentence, Not):
+            expression = f"not {operands[0]}"
+        elif isinstance(sentence, And):
+            expression = " and ".join(operands) or "True"
+        elif isinstance(sentence, Or):
+            expression = " or ".join(operands) or "False"
+        elif isinstance(sentence, Implication):
+            expression = f"not {operands[0]} or {operands[1]}"
+        else:
+            expression = f"(not {operands[0]}) == (not {operands[1]})"
+        names[sentence] = f"v{len(steps)}"
+        steps.append(f"(v{len(steps)} := ({expression}))")
+
+    result = template.format(*[names[sentence] for sentence in sentences])
+    if not steps:
+        return f"lambda m: {result}"
+    return f"lambda m: ({', '.join(steps)}, {result})[-1]"
+
+
+def most_occurrences(knowledge, query):
+    """Orders symbols by how often they occur in knowledge and query."""
+    counts = dict()
+    occurrences = dict()
+
+    def count(sentence):
+        if sentence not in occurrences:
+            if isinstance(sentence, Symbol):
+                occurrences[sentence] = {sentence.name: 1}
+            else:
+                occurrences[sentence] = total = dict()
+                for operand in sentence.operands():
+                    for name, n in count(operand).items():
+                        total[name] = total.get(name, 0) + n
+        return occurrences[sentence]
+
+    for sentence in (knowledge, query):
+        for name, n in count(sentence).items():
+            counts[name] = counts.get(name, 0) + n
+    return sorted(counts, key=lambda name: (-counts[name], name))
+
+
+def alphabetical(knowledge, query):
+    """Orders symbols by name."""
+    return sorted(knowledge.symbols() | query.symbols())
+
+
+# Symbol orderings for model_check(engine="pruned")
+ORDERINGS = {
+    "occurrences": most_occurrences,
+    "alphabetical": alphabetical,
+}
+
+
+def model_check(knowledge, query, engine="compiled", ordering="occurrences",
+                stats=None, workers=None):
+    """
+    Checks if knowledge base entails query.
+
+    `engine` picks how models are explored, and `ordering` the order in
+    which the "pruned" engine assigns symbols. If `stats` is a dictionary,
+    engines that walk the space of models count visited nodes in
+    `stats["visited"]`. With more than one of `workers`, the "compiled"
+    engine splits the models across that many processes; other engines
+    run in one process, so asking them for workers is an error.
+    """
+    if workers is not None and workers > 1:
+        if engine != "compiled":
+            raise ValueError(f"engine {engine} cannot use workers")
+        return model_check_parallel(knowledge, query, workers)
+    if engine == "pruned":
+        return model_check_pruned(knowledge, query, ordering, stats)
+    if engine == "gray":
+        return model_check_gray(knowledge, query, stats)
+    if engine == "compiled":
+        return model_check_compiled(knowledge, query)
+    if engine == "vectorized":
+        return model_check_vectorized(knowledge, query)
+    if engine == "dpll":
+        return model_check_dpll(knowledge, query)
+    if engine != "enumerate":
+        raise ValueError(f"unknown engine {engine}")
+
+    visited = 0
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
+        nonlocal visited
+        visited += 1
 
         # If model has an assignment for each symbol
         if not symbols:
@@ -257,7 +1131,521 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    result = check_all(knowledge, query, symbols, dict())
+    if stats is not None:
+        stats["visited"] = stats.get("visited", 0) + visited
+    return result
+
+
+def model_check_pruned(knowledge, query, ordering="occurrences", stats=None):
+    """
+    Checks if knowledge base entails query, evaluating both on partial
+    models so that a branch is cut as soon as its outcome is known.
+    """
+    symbols = ORDERINGS[ordering](knowledge, query)
+    model = dict()
+    visited = 0
+
+    def check_all(i):
+        """Checks if knowledge base entails query in all completions."""
+        nonlocal visited
+        visited += 1
+
+        # Entailment holds wherever knowledge is false or query true
+        kb = knowledge.evaluate_partial(model)
+        if kb is False:
+            return True
+        q = query.evaluate_partial(model)
+        if q is True:
+            return True
+
+        # Every completion here is a counter-model
+        if kb is True and q is False:
+            return False
+
+        # Otherwise branch on the next symbol
+        p = symbols[i]
+        for value in (True, False):
+            model[p] = value
+            if not check_all(i + 1):
+                return False
+        del model[p]
+        return True
+
+    result = check_all(0)
+    if stats is not None:
+        stats["visited"] = stats.get("visited", 0) + visited
+    return result
+
+
+# Kinds of subsentence for model_check(engine="gray")
+SYMBOL, NOT, AND, OR, IMPLICATION, BICONDITIONAL = range(6)
+GRAY_KINDS = {
+    Symbol: SYMBOL, Not: NOT, And: AND, Or: OR,
+    Implication: IMPLICATION, Biconditional: BICONDITIONAL,
+}
+
+
+def model_check_gray(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query by visiting models in Gray
+    code order, so that each model differs from the last in one symbol.
+    Only subsentences depending on the flipped symbol are re-evaluated,
+    in an order fixed in advance for each symbol.
+
+    This engine neither recurses nor copies models, so it handles any
+    number of symbols and any depth of nesting. It is not faster than
+    the recursive engines, though, and far slower than "compiled": each
+    re-evaluated subsentence costs an interpreted step.
+    """
+
+    # Number subsentences so that operands come before what uses them
+    ids = dict()
+    nodes = []
+    stack = [(knowledge, False), (query, False)]
+    while stack:
+        sentence, expanded = stack.pop()
+        if sentence in ids:
+            continue
+        if expanded:
+            ids[sentence] = len(nodes)
+            nodes.append(sentence)
+        else:
+            stack.append((sentence, True))
+            for operand in sentence.operands():
+                if operand not in ids:
+                    stack.append((operand, False))
+    operands = [[ids[operand] for operand in node.operands()]
+                for node in nodes]
+
+    # Dependency index from each subsentence to those using it
+    parents = [[] for _ in nodes]
+    for i, children in enumerate(operands):
+        for child in children:
+            parents[child].append(i)
+
+    kinds = [GRAY_KINDS[type(node)] for node in nodes]
+
+    def compute(i):
+        kind = kinds[i]
+        children = operands[i]
+        if kind == AND:
+            return trues[i] == len(children)
+        if kind == OR:
+            return trues[i] > 0
+        if kind == NOT:
+            return not value[children[0]]
+        if kind == IMPLICATION:
+            return not value[children[0]] or value[children[1]]
+        return value[children[0]] == value[children[1]]
+
+    # Start from the model where every symbol is false
+    value = [False] * len(nodes)
+    trues = [0] * len(nodes)
+    for i, node in enumerate(nodes):
+        if not isinstance(node, Symbol):
+            value[i] = compute(i)
+        for parent in parents[i]:
+            trues[parent] += value[i]
+
+    symbols = [ids[Symbol(name)]
+               for name in sorted(knowledge.symbols() | query.symbols())]
+    kb, q = ids[knowledge], ids[query]
+
+    # Subsentences depending on each symbol, operands first
+    dependents = dict()
+    for leaf in symbols:
+        found = set()
+        frontier = [leaf]
+        while frontier:
+            for parent in parents[frontier.pop()]:
+                if parent not in found:
+                    found.add(parent)
+                    frontier.append(parent)
+        dependents[leaf] = sorted(found)
+
+    stale = [False] * len(nodes)
+    visited = 1
+    result = not value[kb] or value[q]
+
+    for step in range(1, 1 << len(symbols)):
+        if not result:
+            break
+        visited += 1
+
+        # Flip the symbol of the lowest set bit of the step
+        leaf = symbols[(step & -step).bit_length() - 1]
+        value[leaf] = not value[leaf]
+        delta = 1 if value[leaf] else -1
+        pending = 0
+        for parent in parents[leaf]:
+            trues[parent] += delta
+            if not stale[parent]:
+                stale[parent] = True
+                pending += 1
+
+        # Re-evaluate stale dependents, stopping once none are left
+        for i in dependents[leaf]:
+            if not pending:
+                break
+            if not stale[i]:
+                continue
+            stale[i] = False
+            pending -= 1
+            new = compute(i)
+            if new != value[i]:
+                value[i] = new
+                delta = 1 if new else -1
+                for parent in parents[i]:
+                    trues[parent] += delta
+                    if not stale[parent]:
+                        stale[parent] = True
+                        pending += 1
+        result = not value[kb] or value[q]
+
+    if stats is not None:
+        stats["visited"] = stats.get("visited", 0) + visited
+    return result
+
+
+def model_check_compiled(knowledge, query):
+    """
+    Checks if knowledge base entails query by enumerating models as
+    integer bitmasks against a compiled form of knowledge and query.
+    """
+
+    # Give each symbol a fixed bit position
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    # Entailment holds in a model unless knowledge is true and query false
+    _, holds = compile_lambda([knowledge, query], index, "not {0} or {1}")
+
+    # Check that entailment holds in every model
+    return all(map(holds, range(1 << len(symbols))))
+
+
+def model_check_vectorized(knowledge, query, chunk_bits=16):
+    """
+    Checks if knowledge base entails query by evaluating knowledge and
+    query over boolean NumPy columns holding 2**chunk_bits models at a time.
+    """
+    import numpy as np
+
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    chunk_bits = min(chunk_bits, len(symbols))
+
+    # The first `chunk_bits` symbols vary within a chunk
+    rows = np.arange(1 << chunk_bits)
+    varying = {
+        symbol: ((rows >> i) & 1).astype(bool)
+        for i, symbol in enumerate(symbols[:chunk_bits])
+    }
+
+    # The remaining symbols are fixed for a chunk by the chunk number
+    fixed = symbols[chunk_bits:]
+    for chunk in range(1 << len(fixed)):
+        columns = dict(varying)
+        for i, symbol in enumerate(fixed):
+            columns[symbol] = np.bool_((chunk >> i) & 1)
+
+        # Entailment fails if knowledge is true and query false in any model
+        kb = knowledge.evaluate_array(columns)
+        if not np.all(~kb | query.evaluate_array(columns)):
+            return False
+    return True
+
+
+def model_check_dpll(knowledge, query):
+    """
+    Checks if knowledge base entails query by showing that knowledge
+    together with the negation of query is unsatisfiable.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.clauses.append([-cnf.encode(query)])
+
+    solver = Solver()
+    solver.reserve(cnf.count)
+    for clause in cnf.clauses:
+        if not solver.add_clause(clause):
+            return True
+    return not solver.solve()
+
+
+# Compiled entailment test and cancellation flag of a worker process
+worker_holds = None
+worker_cancelled = None
+
+# Models a worker checks between looks at the cancellation flag
+WORKER_BATCH = 1 << 16
+
+
+def start_worker(source, cancelled):
+    """Compiles the entailment test once when a worker process starts."""
+    global worker_holds, worker_cancelled
+    worker_holds = eval(source)
+    worker_cancelled = cancelled
+
+
+def check_cube(start, stop):
+    """Checks that entailment holds in models `start` up to `stop`."""
+    for low in range(start, stop, WORKER_BATCH):
+        if worker_cancelled.is_set():
+            return True
+        high = min(low + WORKER_BATCH, stop)
+        if not all(map(worker_holds, range(low, high))):
+            return False
+    return True
+
+
+def model_check_parallel(knowledge, query, workers):
+    """
+    Checks if knowledge base entails query across `workers` processes.
+    The models are split into sub-cubes by fixing the highest symbols,
+    and the first counter-model found cancels the remaining work.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    source, _ = compile_lambda([knowledge, query], index, "not {0} or {1}")
+
+    # A few sub-cubes per worker keeps the load balanced
+    fixed = min(len(symbols), (workers * 4 - 1).bit_length())
+    width = len(symbols) - fixed
+
+    cancelled = multiprocessing.Event()
+    with ProcessPoolExecutor(workers, initializer=start_worker,
+                             initargs=(source, cancelled)) as executor:
+        futures = [
+            executor.submit(check_cube, cube << width, (cube + 1) << width)
+            for cube in range(1 << fixed)
+        ]
+        for future in as_completed(futures):
+            if not future.result():
+                cancelled.set()
+                for other in futures:
+                    other.cancel()
+                return False
+    return True
+
+
+# Operators and parentheses of the formula() syntax
+TOKENS = re.compile(r"(¬|∧|∨|<=>|=>|⊤|⊥|\(|\))")
+
+
+def parse(text):
+    """
+    Parses a formula written in the syntax of `Sentence.formula`, where
+    ¬ binds tightest, then ∧, ∨, => and <=>. Anything between operators
+    and parentheses is a symbol name. ⊤ is the empty conjunction And(),
+    which is true, and ⊥ the empty disjunction Or(), which is false.
+    The empty formula is And().
+    """
+    tokens = [token.strip() for token in TOKENS.split(text)]
+    tokens = [token for token in tokens if token]
+    if not tokens:
+        return And()
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def expect(token):
+        nonlocal position
+        if peek() != token:
+            raise ValueError(f"expected {token} at token {position}")
+        position += 1
+
+    def biconditional():
+        nonlocal position
+        left = implication()
+        while peek() == "<=>":
+            position += 1
+            left = Biconditional(left, implication())
+        return left
+
+    def implication():
+        nonlocal position
+        antecedent = disjunction()
+        if peek() == "=>":
+            position += 1
+            return Implication(antecedent, implication())
+        return antecedent
+
+    def disjunction():
+        nonlocal position
+        disjuncts = [conjunction()]
+        while peek() == "∨":
+            position += 1
+            disjuncts.append(conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction():
+        nonlocal position
+        conjuncts = [negation()]
+        while peek() == "∧":
+            position += 1
+            conjuncts.append(negation())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def negation():
+        nonlocal position
+        token = peek()
+        if token == "¬":
+            position += 1
+            return Not(negation())
+        if token == "(":
+            position += 1
+            sentence = biconditional()
+            expect(")")
+            return sentence
+        if token == "⊤":
+            position += 1
+            return And()
+        if token == "⊥":
+            position += 1
+            return Or()
+        if token is None or TOKENS.fullmatch(token):
+            raise ValueError(f"unexpected {token} at token {position}")
+        position += 1
+        return Symbol(token)
+
+    sentence = biconditional()
+    if position != len(tokens):
+        raise ValueError(f"unexpected {tokens[position]} at token {position}")
+    return sentence
+
+
+# Binary format: header, symbol names, node table and root references
+MAGIC = b"LOGIC\x01"
+HEADER = struct.Struct("<6sIIII")
+TAGS = {Not: 1, And: 2, Or: 3, Implication: 4, Biconditional: 5}
+CLASSES = {tag: cls for cls, tag in TAGS.items()}
+
+
+def dumps(sentences):
+    """
+    Serializes a list of sentences to bytes. Symbols are stored once in
+    a shared table, and every distinct subsentence is stored once as a
+    node referring to earlier symbols and nodes by number.
+    """
+    names = sorted(frozenset().union(*[s.symbols() for s in sentences]))
+    refs = {Symbol(name): i for i, name in enumerate(names)}
+    words = array("I")
+
+    def ref(sentence):
+        if sentence not in refs:
+            children = [ref(operand) for operand in sentence.operands()]
+            words.append(TAGS[type(sentence)])
+            words.append(len(children))
+            words.extend(children)
+            refs[sentence] = len(refs)
+        return refs[sentence]
+
+    roots = array("I", [ref(sentence) for sentence in sentences])
+    table = "\0".join(names).encode("utf-8")
+    if sys.byteorder == "big":
+        words.byteswap()
+        roots.byteswap()
+    header = HEADER.pack(MAGIC, len(names), len(table), len(words), len(roots))
+    return header + table + words.tobytes() + roots.tobytes()
+
+
+def loads(data):
+    """
+    Deserializes a list of sentences from bytes written by `dumps`.
+    Consecutive nodes of one kind and size are decoded together, a
+    column of operands at a time, and built straight from operands that
+    are sentences by construction, hashed from their operands' hashes.
+    The cyclic garbage collector is paused meanwhile: sentences never
+    form cycles, so collecting while building would only rescan them.
+    """
+    magic, count, size, length, roots = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a serialized knowledge base")
+    offset = HEADER.size
+    table = bytes(data[offset:offset + size]).decode("utf-8")
+    offset += size
+    words = array("I")
+    words.frombytes(data[offset:offset + 4 * length])
+    offset += 4 * length
+    refs = array("I")
+    refs.frombytes(data[offset:offset + 4 * roots])
+    if sys.byteorder == "big":
+        words.byteswap()
+        refs.byteswap()
+
+    nodes = [Symbol(name) for name in table.split("\0")] if count else []
+    hashes = [node._hash for node in nodes]
+    words = words.tolist()
+    classes = {tag: (cls.build, cls.word) for tag, cls in CLASSES.items()}
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        i = 0
+        window = 1
+        while i < length:
+
+            # Find the run of nodes with this node's tag and operand count,
+            # at most `window` long so nested sentences stay linear
+            tag, arity = words[i], words[i + 1]
+            build, word = classes[tag]
+            stride = arity + 2
+            stop = min(length, i + stride * window)
+            end = i + stride
+            while end < stop and words[end] == tag and words[end + 1] == arity:
+                end += stride
+            size = (end - i) // stride
+            start = len(nodes)
+            if size == 1:
+                operands = words[i + 2:end]
+                nodes.append(build(
+                    tuple(map(nodes.__getitem__, operands)),
+                    hash((word, tuple(map(hashes.__getitem__, operands))))
+                ))
+                hashes.append(nodes[-1]._hash)
+                window *= 2
+                i = end
+                continue
+
+            # Cut it short before a node using one built within the run
+            columns = [words[i + 2 + k:end:stride] for k in range(arity)]
+            if any(max(column) >= start for column in columns):
+                size = min(next(n for n, r in enumerate(column) if r >= start)
+                           for column in columns if max(column) >= start)
+                columns = [column[:size] for column in columns]
+                window = 1
+            else:
+                window *= 2
+            i += size * stride
+
+            if arity:
+                operands = zip(*[map(nodes.__getitem__, column)
+                                 for column in columns])
+                keys = zip(*[map(hashes.__getitem__, column)
+                             for column in columns])
+            else:
+                operands = itertools.repeat((), size)
+                keys = itertools.repeat((), size)
+            nodes.extend(map(
+                build, operands,
+                map(hash, zip(itertools.repeat(word), keys))
+            ))
+            hashes.extend([node._hash for node in nodes[start:]])
+    finally:
+        if collecting:
+            gc.enable()
+    return [nodes[r] for r in refs]
+
+
+def dump(sentences, f):
+    """Writes a list of sentences to a binary file."""
+    f.write(dumps(sentences))
+
+
+def load(f):
+    """Reads a list of sentences from a binary file written by `dump`."""
+    return loads(f.read())
@@ -1,5 +1,68 @@
+import collections
 import itertools
+import math
 import random
+import struct
+from fractions import Fraction
+
+import numpy as np
+
+# Snapshot headers: magic, height, width, then mines for a game, or
+# total mines (-1 if unknown), inference and sentences for an AI
+GAME_MAGIC = b"MINES\x01"
+GAME_HEADER = struct.Struct("<6sIII")
+AI_MAGIC = b"MINAI\x01"
+AI_HEADER = struct.Struct("<6sIIiBI")
+AI_COUNTERS = struct.Struct("<4Q")
+INFERENCES = ("subset", "linear")
+
+
+def pack_cells(cells, height, width):
+    """
+    Packs a set of cells into a bitmap, one bit per cell.
+    """
+    board = np.zeros(height * width, dtype=bool)
+    for i, j in cells:
+        board[i * width + j] = True
+    return np.packbits(board).tobytes()
+
+
+def unpack_cells(data, offset, height, width):
+    """
+    Unpacks a bitmap written by pack_cells at `offset` in `data`.
+    Returns the set of cells and the offset just past the bitmap.
+    """
+    size = (height * width + 7) // 8
+    board = np.unpackbits(np.frombuffer(data, np.uint8, size, offset),
+                          count=height * width)
+    positions = np.flatnonzero(board)
+    cells = set(zip(*(a.tolist() for a in np.divmod(positions, width))))
+    return cells, offset + size
+
+
+def pack_random(rng):
+    """
+    Packs the state of a random.Random instance.
+    """
+    version, state, gauss = rng.getstate()
+    return (struct.pack(f"<BI{len(state)}I", version, len(state), *state)
+            + struct.pack("<?d", gauss is not None, gauss or 0.0))
+
+
+def unpack_random(data, offset):
+    """
+    Unpacks a random.Random written by pack_random at `offset` in `data`.
+    Returns the instance and the offset just past its state.
+    """
+    version, length = struct.unpack_from("<BI", data, offset)
+    offset += struct.calcsize("<BI")
+    state = struct.unpack_from(f"<{length}I", data, offset)
+    offset += 4 * length
+    has_gauss, gauss = struct.unpack_from("<?d", data, offset)
+    offset += struct.calcsize("<?d")
+    rng = random.Random()
+    rng.setstate((version, state, gauss if has_gauss else None))
+    return rng, offset
 
 
 class Minesweeper():
@@ -7,32 +70,78 @@ class Minesweeper():
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None):
 
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        # Games with the same seed have the same mines
+        self.random = random.Random(seed)
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Add mines at distinct cells chosen at random
+        rng = np.random.default_rng(self.random.getrandbits(64))
+        positions = rng.choice(height * width, size=mines, replace=False)
+        self.board = np.zeros((height, width), dtype=bool)
+        self.board.flat[positions] = True
+        self.count_mines()
 
         # At first, player has found no mines
         self.mines_found = set()
 
+        # Cells revealed so far
+        self.revealed = set()
+
+    def count_mines(self):
+        """
+        Finds the mines on the board, and counts the mines around every
+        cell by summing shifted boards.
+        """
+        height, width = self.height, self.width
+        rows, columns = np.nonzero(self.board)
+        self.mines = set(zip(rows.tolist(), columns.tolist()))
+        padded = np.pad(self.board, 1).astype(np.uint8)
+        self.counts = np.zeros((height, width), dtype=np.uint8)
+        for di in range(3):
+            for dj in range(3):
+                if (di, dj) != (1, 1):
+                    self.counts += padded[di:di + height, dj:dj + width]
+
+    def snapshot(self):
+        """
+        Returns the game as bytes: the mines, revealed cells and flagged
+        cells as bitmaps, and the state of its random number generator.
+        """
+        return b"".join([
+            GAME_HEADER.pack(GAME_MAGIC, self.height, self.width,
+                             len(self.mines)),
+            np.packbits(self.board).tobytes(),
+            pack_cells(self.revealed, self.height, self.width),
+            pack_cells(self.mines_found, self.height, self.width),
+            pack_random(self.random),
+        ])
+
+    @classmethod
+    def restore(cls, data):
+        """
+        Returns the game saved in a snapshot.
+        """
+        magic, height, width, _ = GAME_HEADER.unpack_from(data)
+        if magic != GAME_MAGIC:
+            raise ValueError("not a Minesweeper snapshot")
+        game = cls.__new__(cls)
+        game.height = height
+        game.width = width
+        board, offset = unpack_cells(data, GAME_HEADER.size, height, width)
+        game.board = np.zeros((height, width), dtype=bool)
+        for i, j in board:
+            game.board[i, j] = True
+        game.count_mines()
+        game.revealed, offset = unpack_cells(data, offset, height, width)
+        game.mines_found, offset = unpack_cells(data, offset, height, width)
+        game.random, _ = unpack_random(data, offset)
+        return game
+
     def print(self):
         """
         Prints a text-based representation
@@ -50,7 +159,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i, j])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +167,38 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return int(self.counts[i, j])
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+    def reveal(self, cell):
+        """
+        Reveals a cell that is not a mine. If no mines are near it, its
+        neighbors are revealed too, and so on outward.
+        Returns a list of (cell, nearby mines) for every newly revealed cell.
+        """
+        if self.is_mine(cell):
+            raise ValueError(f"{cell} is a mine")
+        if cell in self.revealed:
+            return []
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+        self.revealed.add(cell)
+        revealed = []
+        queue = collections.deque([cell])
+        while queue:
+            cell = queue.popleft()
+            count = self.nearby_mines(cell)
+            revealed.append((cell, count))
+            if count:
+                continue
 
-        return count
+            # No neighbor of a cell without nearby mines is a mine
+            for i in range(cell[0] - 1, cell[0] + 2):
+                for j in range(cell[1] - 1, cell[1] + 2):
+                    if (0 <= i < self.height and 0 <= j < self.width
+                            and (i, j) not in self.revealed):
+                        self.revealed.add((i, j))
+                        queue.append((i, j))
+        return revealed
 
     def won(self):
         """
@@ -140,17 +263,291 @@ class Sentence():
             self.cells.remove(cell)
 
 
+def bits(mask):
+    """
+    Yields the positions of the set bits of an integer, lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitSentence():
+    """
+    Compact logical statement about a Minesweeper game.
+    The cells are stored as an integer bitmask over the board,
+    where cell (i, j) is bit i * width + j.
+    """
+
+    __slots__ = ("mask", "count", "width")
+
+    def __init__(self, cells, count, width):
+        self.mask = 0
+        for i, j in cells:
+            self.mask |= 1 << (i * width + j)
+        self.count = count
+        self.width = width
+
+    @classmethod
+    def from_mask(cls, mask, count, width):
+        """
+        Returns a sentence with the given bitmask of cells.
+        """
+        sentence = cls.__new__(cls)
+        sentence.mask = mask
+        sentence.count = count
+        sentence.width = width
+        return sentence
+
+    @property
+    def cells(self):
+        return {divmod(bit, self.width) for bit in bits(self.mask)}
+
+    def __eq__(self, other):
+        return self.mask == other.mask and self.count == other.count
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def key(self):
+        """
+        Returns a hashable key equal for all equal sentences.
+        """
+        return (self.mask, self.count)
+
+    def __sub__(self, other):
+        return BitSentence.from_mask(
+            self.mask & ~other.mask, self.count - other.count, self.width
+        )
+
+    def issubset(self, other):
+        return self.mask & other.mask == self.mask
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.count and self.mask.bit_count() == self.count:
+            return self.cells
+        return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        return set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        bit = 1 << (cell[0] * self.width + cell[1])
+        if self.mask & bit:
+            self.mask ^= bit
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        bit = 1 << (cell[0] * self.width + cell[1])
+        if self.mask & bit:
+            self.mask ^= bit
+
+
+class LinearSystem():
+    """
+    Minesweeper sentences as a sparse system of linear equations over
+    cell bits, kept in reduced row echelon form as equations arrive.
+    Every row has a pivot bit that appears in no other row.
+    """
+
+    def __init__(self):
+
+        # Coefficients and right-hand side of each row, by pivot bit
+        self.rows = dict()
+        self.values = dict()
+
+        # Pivots of the rows each bit appears in
+        self.columns = dict()
+
+    def add(self, coefficients, value):
+        """
+        Adds the equation sum(coefficients[bit] * bit) = value.
+        Returns the pivots of the rows that changed.
+        """
+        coefficients = dict(coefficients)
+
+        # Eliminate existing pivots from the new row
+        for pivot in [bit for bit in coefficients if bit in self.rows]:
+            factor = coefficients[pivot]
+            for bit, c in self.rows[pivot].items():
+                c = coefficients.get(bit, 0) - factor * c
+                if c:
+                    coefficients[bit] = c
+                else:
+                    del coefficients[bit]
+            value -= factor * self.values[pivot]
+        if not coefficients:
+            return []
+
+        # Pivot on the bit in fewest rows, to keep rows sparse
+        pivot = min(coefficients,
+                    key=lambda bit: (len(self.columns.get(bit, ())), bit))
+        # Coefficients stay integers unless a division needs a fraction
+        factor = coefficients[pivot]
+        if factor == -1:
+            coefficients = {bit: -c for bit, c in coefficients.items()}
+            value = -value
+        elif factor != 1:
+            factor = Fraction(factor)
+            coefficients = {bit: c / factor
+                            for bit, c in coefficients.items()}
+            value /= factor
+
+        # Eliminate the new pivot from every other row
+        changed = [pivot]
+        for other in list(self.columns.get(pivot, ())):
+            row = self.rows[other]
+            factor = row[pivot]
+            for bit, c in coefficients.items():
+                c = row.get(bit, 0) - factor * c
+                if c:
+                    if bit not in row:
+                        self.columns.setdefault(bit, set()).add(other)
+                    row[bit] = c
+                elif bit in row:
+                    del row[bit]
+                    self.columns[bit].discard(other)
+            self.values[other] -= factor * value
+            changed.append(other)
+
+        self.rows[pivot] = coefficients
+        self.values[pivot] = value
+        for bit in coefficients:
+            self.columns.setdefault(bit, set()).add(pivot)
+        return changed
+
+    def assign(self, bit, value):
+        """
+        Substitutes a known value for a bit.
+        Returns the pivots of the rows that changed.
+        """
+        changed = []
+        for pivot in self.columns.pop(bit, ()):
+            row = self.rows[pivot]
+            self.values[pivot] -= row.pop(bit) * value
+            if pivot != bit:
+                changed.append(pivot)
+                continue
+
+            # The row lost its pivot, so add what is left of it again
+            del self.rows[pivot]
+            rest = self.values.pop(pivot)
+            for other in row:
+                self.columns[other].discard(pivot)
+            changed.extend(self.add(row, rest))
+        return changed
+
+    def deduce(self, pivots):
+        """
+        Returns the bits that the given rows prove to be mines and safe,
+        where a row's value is as low or as high as its bits allow.
+        """
+        mines = set()
+        safes = set()
+        for pivot in sorted(set(pivots)):
+            if pivot not in self.rows:
+                continue
+            row = self.rows[pivot]
+            low = sum(c for c in row.values() if c < 0)
+            high = sum(c for c in row.values() if c > 0)
+            if self.values[pivot] == low:
+                safes.update(bit for bit, c in row.items() if c > 0)
+                mines.update(bit for bit, c in row.items() if c < 0)
+            elif self.values[pivot] == high:
+                mines.update(bit for bit, c in row.items() if c > 0)
+                safes.update(bit for bit, c in row.items() if c < 0)
+        return mines, safes
+
+    def snapshot(self):
+        """
+        Returns the rows as bytes, each as its pivot, its value as a
+        numerator and denominator, and its coefficients likewise.
+        """
+        parts = [struct.pack("<I", len(self.rows))]
+        for pivot, row in self.rows.items():
+            value = Fraction(self.values[pivot])
+            parts.append(struct.pack("<IqqI", pivot, value.numerator,
+                                     value.denominator, len(row)))
+            for bit, c in row.items():
+                c = Fraction(c)
+                parts.append(struct.pack("<Iqq", bit, c.numerator,
+                                         c.denominator))
+        return b"".join(parts)
+
+    @classmethod
+    def restore(cls, data, offset):
+        """
+        Returns the system saved by snapshot at `offset` in `data`,
+        and the offset just past it.
+        """
+        def number(numerator, denominator):
+            if denominator == 1:
+                return numerator
+            return Fraction(numerator, denominator)
+
+        system = cls()
+        n_rows, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        for _ in range(n_rows):
+            pivot, numerator, denominator, length = struct.unpack_from(
+                "<IqqI", data, offset)
+            offset += struct.calcsize("<IqqI")
+            row = dict()
+            for _ in range(length):
+                bit, n, d = struct.unpack_from("<Iqq", data, offset)
+                offset += struct.calcsize("<Iqq")
+                row[bit] = number(n, d)
+                system.columns.setdefault(bit, set()).add(pivot)
+            system.rows[pivot] = row
+            system.values[pivot] = number(numerator, denominator)
+        return system, offset
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, total_mines=None,
+                 inference="subset", seed=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # AIs with the same seed make the same moves in the same game
+        self.random = random.Random(seed)
+
+        # With "linear" inference, sentences also form a linear system
+        if inference not in INFERENCES:
+            raise ValueError(f"unknown inference {inference}")
+        self.inference = inference
+        self.system = LinearSystem() if inference == "linear" else None
+        self.changed_rows = set()
+
+        # Number of mines on the board, if known
+        self.total_mines = total_mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -158,8 +555,102 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by sentence key
+        self.knowledge = dict()
+
+        # Sentences mentioning each cell, by cell bit and id(sentence)
+        self.cell_sentences = dict()
+
+        # Sentences changed since they were last used for inference
+        self.dirty = dict()
+
+        # Sentences added, dropped once empty, and dropped as duplicates
+        self.added = 0
+        self.removed = 0
+        self.duplicates = 0
+        self.peak = 0
+
+        # Mine configurations of frontier components seen before
+        self.component_cache = dict()
+
+    def snapshot(self):
+        """
+        Returns the AI as bytes, between moves: cells moved to, mines and
+        safes as bitmaps, sentences as masks in knowledge order, the order
+        of sentences in the cell index, and the random number generator.
+        """
+        height, width = self.height, self.width
+        size = (height * width + 7) // 8
+        index = {id(sentence): k
+                 for k, sentence in enumerate(self.knowledge.values())}
+        total_mines = -1 if self.total_mines is None else self.total_mines
+        parts = [
+            AI_HEADER.pack(AI_MAGIC, height, width, total_mines,
+                           INFERENCES.index(self.inference),
+                           len(self.knowledge)),
+            AI_COUNTERS.pack(self.added, self.removed, self.duplicates,
+                             self.peak),
+            pack_cells(self.moves_made, height, width),
+            pack_cells(self.mines, height, width),
+            pack_cells(self.safes, height, width),
+        ]
+        for sentence in self.knowledge.values():
+            parts.append(sentence.mask.to_bytes(size, "little"))
+            parts.append(struct.pack("<H", sentence.count))
+        parts.append(struct.pack("<I", len(self.cell_sentences)))
+        for bit, sentences in self.cell_sentences.items():
+            parts.append(struct.pack(f"<II{len(sentences)}I", bit,
+                                     len(sentences),
+                                     *(index[key] for key in sentences)))
+        if self.system is not None:
+            parts.append(self.system.snapshot())
+        parts.append(pack_random(self.random))
+        return b"".join(parts)
+
+    @classmethod
+    def restore(cls, data):
+        """
+        Returns the AI saved in a snapshot.
+        """
+        magic, height, width, total_mines, inference, n_sentences = (
+            AI_HEADER.unpack_from(data))
+        if magic != AI_MAGIC:
+            raise ValueError("not a MinesweeperAI snapshot")
+        ai = cls(height, width, None if total_mines < 0 else total_mines,
+                 INFERENCES[inference])
+        offset = AI_HEADER.size
+        ai.added, ai.removed, ai.duplicates, ai.peak = (
+            AI_COUNTERS.unpack_from(data, offset))
+        offset += AI_COUNTERS.size
+        ai.moves_made, offset = unpack_cells(data, offset, height, width)
+        ai.mines, offset = unpack_cells(data, offset, height, width)
+        ai.safes, offset = unpack_cells(data, offset, height, width)
+
+        size = (height * width + 7) // 8
+        sentences = []
+        for _ in range(n_sentences):
+            mask = int.from_bytes(data[offset:offset + size], "little")
+            count, = struct.unpack_from("<H", data, offset + size)
+            offset += size + 2
+            sentence = BitSentence.from_mask(mask, count, width)
+            ai.knowledge[sentence.key()] = sentence
+            sentences.append(sentence)
+
+        n_bits, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        for _ in range(n_bits):
+            bit, length = struct.unpack_from("<II", data, offset)
+            offset += 8
+            ai.cell_sentences[bit] = {
+                id(sentences[k]): sentences[k]
+                for k in struct.unpack_from(f"<{length}I", data, offset)
+            }
+            offset += 4 * length
+
+        if ai.system is not None:
+            ai.system, offset = LinearSystem.restore(data, offset)
+        ai.random, _ = unpack_random(data, offset)
+        return ai
 
     def mark_mine(self, cell):
         """
@@ -167,11 +658,13 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        # print(f"Marking mine: {cell}")
-        for sentence in self.knowledge:
+        bit = cell[0] * self.width + cell[1]
+        if self.system is not None:
+            self.changed_rows.update(self.system.assign(bit, 1))
+        for sentence in self.cell_sentences.pop(bit, {}).values():
+            del self.knowledge[sentence.key()]
             sentence.mark_mine(cell)
-            
-        
+            self.update_sentence(sentence)
 
     def mark_safe(self, cell):
         """
@@ -179,10 +672,104 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        # print(f"Marking safe: {cell}")
-        for sentence in self.knowledge:
-            if cell in sentence.cells:
-                sentence.mark_safe(cell)
+        bit = cell[0] * self.width + cell[1]
+        if self.system is not None:
+            self.changed_rows.update(self.system.assign(bit, 0))
+        for sentence in self.cell_sentences.pop(bit, {}).values():
+            del self.knowledge[sentence.key()]
+            sentence.mark_safe(cell)
+            self.update_sentence(sentence)
+
+    def update_sentence(self, sentence):
+        """
+        Files a sentence that just lost a cell under its new key,
+        or drops it if it became empty or a duplicate.
+        """
+        key = sentence.key()
+        if not sentence.mask:
+            self.removed += 1
+        elif key in self.knowledge:
+            self.duplicates += 1
+        else:
+            self.knowledge[key] = sentence
+            self.dirty[id(sentence)] = sentence
+            return
+
+        # Forget the sentence everywhere
+        self.dirty.pop(id(sentence), None)
+        for bit in bits(sentence.mask):
+            del self.cell_sentences[bit][id(sentence)]
+            if not self.cell_sentences[bit]:
+                del self.cell_sentences[bit]
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and the cell index,
+        unless it says nothing or is already known.
+        """
+        if not sentence.mask or sentence.key() in self.knowledge:
+            return
+        self.knowledge[sentence.key()] = sentence
+        self.added += 1
+        self.peak = max(self.peak, len(self.knowledge))
+        key = id(sentence)
+        for bit in bits(sentence.mask):
+            self.cell_sentences.setdefault(bit, dict())[key] = sentence
+        self.dirty[key] = sentence
+
+    def knowledge_stats(self):
+        """
+        Returns the size of the knowledge base and how much it has
+        changed: sentences added, dropped once empty, dropped as
+        duplicates, and the most sentences held at once.
+        """
+        return {
+            "size": len(self.knowledge),
+            "cells": len(self.cell_sentences),
+            "added": self.added,
+            "removed": self.removed,
+            "duplicates": self.duplicates,
+            "peak": self.peak,
+        }
+
+    def infer(self):
+        """
+        Draws conclusions from changed sentences until none are left,
+        comparing each only with the sentences that share a cell with it,
+        then from changed rows of the linear system, if there is one.
+        """
+        while self.dirty or self.changed_rows:
+            if not self.dirty:
+                mines, safes = self.system.deduce(self.changed_rows)
+                self.changed_rows = set()
+                for bit in sorted(mines):
+                    self.mark_mine(divmod(bit, self.width))
+                for bit in sorted(safes):
+                    self.mark_safe(divmod(bit, self.width))
+                continue
+
+            _, sentence = self.dirty.popitem()
+            mask = sentence.mask
+
+            # Mark cells the sentence settles; that dirties its neighbors
+            if sentence.count == 0 or sentence.count == mask.bit_count():
+                mark = self.mark_mine if sentence.count else self.mark_safe
+                for bit in bits(mask):
+                    mark(divmod(bit, self.width))
+                continue
+
+            # If set1 = count1 is a subset of set2 = count2,
+            # then set2 - set1 = count2 - count1
+            others = dict()
+            for bit in bits(mask):
+                others.update(self.cell_sentences[bit])
+            for other in others.values():
+                if other is sentence:
+                    continue
+                if other.issubset(sentence):
+                    self.add_sentence(sentence - other)
+                elif sentence.issubset(other):
+                    self.add_sentence(other - sentence)
 
     def add_knowledge(self, cell, count):
         """
@@ -199,6 +786,23 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        self.observe(cell, count)
+        self.infer()
+
+    def add_knowledge_batch(self, revealed):
+        """
+        Adds knowledge from many revealed cells at once, given as
+        (cell, count) pairs, and draws conclusions once at the end.
+        """
+        for cell, count in revealed:
+            self.observe(cell, count)
+        self.infer()
+
+    def observe(self, cell, count):
+        """
+        Records that a safe cell was revealed with `count` neighboring
+        mines, adding the sentence it gives to the knowledge base.
+        """
         self.moves_made.add(cell)#1
         self.mark_safe(cell)#2
         #formulating a new statement to be added to knowledge base
@@ -218,49 +822,11 @@ class MinesweeperAI():
                     else:#new info
                         neighbors.add((i,j))
     
-        new_sentence = Sentence(neighbors, count)
-        # print(f"Adding new sentence: {new_sentence.cells, new_sentence.count}")
-        self.knowledge.append(new_sentence)
-
-
-
-        #inference while loop 
-        #first mark all safes and mines
-
-        changed = True
-        while changed:
-            changed = False#reset it so the default is not to start again the loop
-            for sentence in self.knowledge:# loop through all sentences
-                for safe in list(sentence.known_safes()):#if there are safes, loop through safe cells
-                    self.mark_safe(safe)
-                    changed = True
-                for mine in list(sentence.known_mines()):
-                    self.mark_mine(mine)
-                    changed = True
-            
-            # we have two sentences set1 = count1 and set2 = count2 where set1 is a subset of set2
-            # then we can construct the new sentence set2 - set1 = count2 - count1
-            # resolution 
-            new_knowledge = []#initiate a holder
-            for s1, s2 in list(itertools.permutations(self.knowledge, 2)):
-                # print(f"sentences{sentence1.cells, sentence2.cells}")
-                if s1 == s2:
-                    continue
-                if s1.cells.issubset(s2.cells):
-                    # print("is subset")
-                    new_sentence = Sentence((s2.cells- s1.cells), (s2.count - s1.count))
-                    if (
-                        new_sentence.cells 
-                        and new_sentence not in self.knowledge 
-                        and new_sentence != s1 
-                        and new_sentence != s2
-                        ):
-                        new_knowledge.append(new_sentence)
-                        # print(f"changing sentence: {new_sentence.cells, new_sentence.count}")
-                        changed = True
-            self.knowledge.extend(new_knowledge)
-
-                
+        sentence = BitSentence(neighbors, count, self.width)
+        if self.system is not None:
+            self.changed_rows.update(self.system.add(
+                {bit: 1 for bit in bits(sentence.mask)}, count))
+        self.add_sentence(sentence)
 
     def make_safe_move(self):
         """
@@ -274,7 +840,7 @@ class MinesweeperAI():
         avail_set = self.safes.difference(self.moves_made)
         if avail_set:
             # print(f"Making safe move: {avail_set}")
-            return random.choice(list(avail_set))
+            return self.random.choice(sorted(avail_set))
         else:
             return None
             
@@ -289,4 +855,203 @@ class MinesweeperAI():
         all_cells = set(itertools.product(range(self.height), range(self.width)))
         avail_cells = all_cells - self.moves_made.union(self.mines)
         if avail_cells:
-            return random.choice(list(avail_cells))
+            return self.random.choice(sorted(avail_cells))
+
+    def make_best_move(self):
+        """
+        Returns a safe move if one is known, and otherwise the cell
+        least likely to be a mine among those not yet chosen.
+        """
+        move = self.make_safe_move()
+        if move is not None:
+            return move
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return self.make_random_move()
+        return min(probabilities, key=probabilities.get)
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each unknown cell is a mine,
+        counting every mine configuration consistent with the knowledge.
+
+        The constrained cells split into components that share no
+        sentence, which are counted separately and combined by the number
+        of ways the remaining mines fit in the unconstrained cells.
+        """
+        unknown = 0
+        for i in range(self.height):
+            for j in range(self.width):
+                if ((i, j) not in self.moves_made and (i, j) not in self.mines
+                        and (i, j) not in self.safes):
+                    unknown |= 1 << (i * self.width + j)
+        components = [self.configurations(sentences)
+                      for sentences in self.components()]
+        frontier = 0
+        for cells, _ in components:
+            for bit in cells:
+                frontier |= 1 << bit
+        free = (unknown & ~frontier).bit_count()
+
+        # Without the number of mines, treat the components independently
+        if self.total_mines is None:
+            return self.local_probabilities(components, unknown & ~frontier)
+        remaining = self.total_mines - len(self.mines)
+
+        def weight(mines):
+            if mines > remaining:
+                return 0
+            return math.comb(free, remaining - mines)
+
+        def convolve(a, b):
+            result = dict()
+            for m1, w1 in a.items():
+                for m2, w2 in b.items():
+                    result[m1 + m2] = result.get(m1 + m2, 0) + w1 * w2
+            return result
+
+        # Ways of placing mines in all components, by number of mines
+        totals = [{m: ways for m, (ways, _) in dist.items()}
+                  for _, dist in components]
+        everything = {0: 1}
+        for total in totals:
+            everything = convolve(everything, total)
+        denominator = sum(ways * weight(m) for m, ways in everything.items())
+        if denominator == 0:
+            return dict()
+
+        probabilities = dict()
+        for k, (cells, dist) in enumerate(components):
+            others = {0: 1}
+            for other, total in enumerate(totals):
+                if other != k:
+                    others = convolve(others, total)
+            numerators = [0] * len(cells)
+            for m, (_, counts) in dist.items():
+                factor = sum(ways * weight(m + rest)
+                             for rest, ways in others.items())
+                for c, count in enumerate(counts):
+                    numerators[c] += count * factor
+            for bit, numerator in zip(cells, numerators):
+                cell = divmod(bit, self.width)
+                probabilities[cell] = numerator / denominator
+
+        # Each unconstrained cell shares the mines left over equally
+        if free:
+            numerator = sum(ways * math.comb(free - 1, remaining - m - 1)
+                            for m, ways in everything.items()
+                            if remaining - m - 1 >= 0)
+            for bit in bits(unknown & ~frontier):
+                cell = divmod(bit, self.width)
+                probabilities[cell] = numerator / denominator
+        return probabilities
+
+    def local_probabilities(self, components, free):
+        """
+        Returns mine probabilities of each component on its own, giving
+        unconstrained cells the average density found on the frontier.
+        """
+        probabilities = dict()
+        expected = 0
+        for cells, dist in components:
+            total = sum(ways for ways, _ in dist.values())
+            if total == 0:
+                continue
+            for c, bit in enumerate(cells):
+                count = sum(counts[c] for _, counts in dist.values())
+                probabilities[divmod(bit, self.width)] = count / total
+                expected += count / total
+        density = expected / len(probabilities) if probabilities else 0.5
+        for bit in bits(free):
+            probabilities[divmod(bit, self.width)] = density
+        return probabilities
+
+    def components(self):
+        """
+        Returns lists of sentences, grouped so that sentences sharing
+        a cell are in the same group.
+        """
+        groups = []
+        seen = set()
+        for key, sentence in self.knowledge.items():
+            if key in seen:
+                continue
+            seen.add(key)
+            group = [sentence]
+            frontier = [sentence]
+            while frontier:
+                for bit in bits(frontier.pop().mask):
+                    for other in self.cell_sentences[bit].values():
+                        if other.key() not in seen:
+                            seen.add(other.key())
+                            group.append(other)
+                            frontier.append(other)
+            groups.append(group)
+        return groups
+
+    def configurations(self, sentences):
+        """
+        Counts the mine configurations of a component's cells that
+        satisfy all its sentences. Returns the component's cells and a
+        dictionary mapping each number of mines to the number of
+        configurations with that many mines and how many of them
+        have a mine in each cell.
+        """
+        key = tuple(sorted(sentence.key() for sentence in sentences))
+        if key in self.component_cache:
+            return self.component_cache[key]
+
+        # Order cells sentence by sentence, so sentences close early
+        cells = []
+        order = dict()
+        for sentence in sorted(sentences, key=lambda s: s.mask):
+            for bit in bits(sentence.mask):
+                if bit not in order:
+                    order[bit] = len(cells)
+                    cells.append(bit)
+
+        # For each cell, its sentences and how many of their cells follow
+        checks = []
+        for position, bit in enumerate(cells):
+            checks.append([
+                (k, sum(1 for other in bits(sentence.mask)
+                        if order[other] > position))
+                for k, sentence in enumerate(sentences)
+                if sentence.mask >> bit & 1
+            ])
+
+        memo = dict()
+
+        def count(position, needed):
+            """
+            Counts configurations of cells from `position` on, given the
+            mines each sentence still needs.
+            """
+            if position == len(cells):
+                return {0: (1, [])}
+            if (position, needed) in memo:
+                return memo[(position, needed)]
+            result = dict()
+            for mine in (0, 1):
+                after = list(needed)
+                for k, rest in checks[position]:
+                    after[k] -= mine
+                    if not 0 <= after[k] <= rest:
+                        break
+                else:
+                    for m, (ways, counts) in count(position + 1,
+                                                   tuple(after)).items():
+                        total, cell_counts = result.get(
+                            m + mine, (0, [0] * (len(cells) - position)))
+                        cell_counts[0] += ways * mine
+                        for c, n in enumerate(counts):
+                            cell_counts[c + 1] += n
+                        result[m + mine] = (total + ways, cell_counts)
+            memo[(position, needed)] = result
+            return result
+
+        dist = count(0, tuple(sentence.count for sentence in sentences))
+        if len(self.component_cache) > 10000:
+            self.component_cache.clear()
+        self.component_cache[key] = (cells, dist)
+        return cells, dist
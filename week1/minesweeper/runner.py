@@ -1,6 +1,7 @@
 import pygame
+import queue
 import sys
-import time
+import threading
 
 from minesweeper import Minesweeper, MinesweeperAI
 
@@ -8,6 +9,9 @@ HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Most frames drawn per second
+FPS = 30
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
@@ -17,6 +21,7 @@ WHITE = (255, 255, 255)
 pygame.init()
 size = width, height = 600, 400
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 # Fonts
 OPEN_SANS = "assets/fonts/OpenSans-Regular.ttf"
@@ -37,186 +42,291 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
+# Render text that never changes once, up front
+glyphs = [smallFont.render(str(n), True, BLACK) for n in range(9)]
+statusTexts = {
+    text: mediumFont.render(text, True, WHITE)
+    for text in ("", "Lost", "Won", "Thinking...")
+}
+
+# Rectangle of every cell
+cells = [
+    [
+        pygame.Rect(
+            board_origin[0] + j * cell_size,
+            board_origin[1] + i * cell_size,
+            cell_size, cell_size
+        )
+        for j in range(WIDTH)
+    ]
+    for i in range(HEIGHT)
+]
+
+# AI Move and Reset buttons, and where the game's status goes
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+statusRect = pygame.Rect(
+    (2 / 3) * width, (2 / 3) * height - 30, width / 3, 60
+)
+
+
+def draw_instructions():
+    """
+    Draws the instructions screen, and returns its Play Game button.
+    """
+    screen.fill(BLACK)
+
+    # Title
+    title = largeFont.render("Play Minesweeper", True, WHITE)
+    titleRect = title.get_rect()
+    titleRect.center = ((width / 2), 50)
+    screen.blit(title, titleRect)
+
+    # Rules
+    rules = [
+        "Click a cell to reveal it.",
+        "Right-click a cell to mark it as a mine.",
+        "Mark all mines successfully to win!"
+    ]
+    for i, rule in enumerate(rules):
+        line = smallFont.render(rule, True, WHITE)
+        lineRect = line.get_rect()
+        lineRect.center = ((width / 2), 150 + 30 * i)
+        screen.blit(line, lineRect)
+
+    # Play game button
+    buttonRect = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
+    buttonText = mediumFont.render("Play Game", True, BLACK)
+    buttonTextRect = buttonText.get_rect()
+    buttonTextRect.center = buttonRect.center
+    pygame.draw.rect(screen, WHITE, buttonRect)
+    screen.blit(buttonText, buttonTextRect)
+    return buttonRect
+
+
+def draw_button(rect, text):
+    """
+    Draws a white button with black text.
+    """
+    buttonText = mediumFont.render(text, True, BLACK)
+    buttonRect = buttonText.get_rect()
+    buttonRect.center = rect.center
+    pygame.draw.rect(screen, WHITE, rect)
+    screen.blit(buttonText, buttonRect)
+
+
+def draw_cell(cell):
+    """
+    Draws a cell with a mine, flag, or number if needed,
+    and returns its rectangle.
+    """
+    i, j = cell
+    rect = cells[i][j]
+    pygame.draw.rect(screen, GRAY, rect)
+    pygame.draw.rect(screen, WHITE, rect, 3)
+    if lost and game.is_mine(cell):
+        screen.blit(mine, rect)
+    elif cell in flags:
+        screen.blit(flag, rect)
+    elif cell in revealed:
+        neighbors = glyphs[game.nearby_mines(cell)]
+        neighborsTextRect = neighbors.get_rect()
+        neighborsTextRect.center = rect.center
+        screen.blit(neighbors, neighborsTextRect)
+    return rect
+
+
+def draw_status():
+    """
+    Draws whether the game is lost, won, or waiting on the AI,
+    and returns the rectangle it takes up.
+    """
+    text = ("Lost" if lost else "Won" if game.mines == flags
+            else "Thinking..." if thinking else "")
+    pygame.draw.rect(screen, BLACK, statusRect)
+    text = statusTexts[text]
+    textRect = text.get_rect()
+    textRect.center = ((5 / 6) * width, (2 / 3) * height)
+    screen.blit(text, textRect)
+    return statusRect
+
+
+def cell_at(position):
+    """
+    Returns the cell at a position on the screen, or None.
+    """
+    j = (position[0] - board_origin[0]) // cell_size
+    i = (position[1] - board_origin[1]) // cell_size
+    if 0 <= i < HEIGHT and 0 <= j < WIDTH:
+        return (i, j)
+    return None
+
+
+def think(jobs, results):
+    """
+    Runs AI inference away from the display. Each job is an AI with
+    either revealed cells to learn from, or None to ask for a move.
+    Jobs run in order, so only this thread touches an AI it was given.
+    """
+    while True:
+        ai, revealedCells = jobs.get()
+        if revealedCells is not None:
+            ai.add_knowledge_batch(revealedCells)
+            continue
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_best_move()
+            if move is None:
+                print("No moves left to make.")
+            else:
+                print("No known safe moves, AI making least risky move.")
+        else:
+            print("AI making safe move.")
+        results.put((ai, move, ai.mines.copy()))
+
+
+def new_game():
+    """
+    Returns a new game and AI agent.
+    """
+    return (
+        Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES),
+        MinesweeperAI(height=HEIGHT, width=WIDTH, total_mines=MINES)
+    )
+
+
+# Start the thread the AI thinks on
+jobs = queue.Queue()
+results = queue.Queue()
+threading.Thread(target=think, args=(jobs, results), daemon=True).start()
+
 # Create game and AI agent
-game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+game, ai = new_game()
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
 flags = set()
 lost = False
 
+# Whether the AI is choosing a move
+thinking = False
+
 # Show instructions initially
 instructions = True
+playButton = draw_instructions()
+pygame.display.flip()
 
 while True:
 
-    # Check if game quit
+    # Cells whose look changed, and whether everything needs drawing
+    dirty = set()
+    redraw = False
+    status = False
+    move = None
+
     for event in pygame.event.get():
+
+        # Check if game quit
         if event.type == pygame.QUIT:
             sys.exit()
 
-    screen.fill(BLACK)
+        if event.type != pygame.MOUSEBUTTONDOWN:
+            continue
+        mouse = event.pos
 
-    # Show game instructions
-    if instructions:
-
-        # Title
-        title = largeFont.render("Play Minesweeper", True, WHITE)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 50)
-        screen.blit(title, titleRect)
-
-        # Rules
-        rules = [
-            "Click a cell to reveal it.",
-            "Right-click a cell to mark it as a mine.",
-            "Mark all mines successfully to win!"
-        ]
-        for i, rule in enumerate(rules):
-            line = smallFont.render(rule, True, WHITE)
-            lineRect = line.get_rect()
-            lineRect.center = ((width / 2), 150 + 30 * i)
-            screen.blit(line, lineRect)
-
-        # Play game button
-        buttonRect = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
-        buttonText = mediumFont.render("Play Game", True, BLACK)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = buttonRect.center
-        pygame.draw.rect(screen, WHITE, buttonRect)
-        screen.blit(buttonText, buttonTextRect)
-
-        # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
+        # Leave the instructions once the play button is clicked
+        if instructions:
+            if event.button == 1 and playButton.collidepoint(mouse):
                 instructions = False
-                time.sleep(0.3)
-
-        pygame.display.flip()
-        continue
-
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
-
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
+                redraw = True
+            continue
 
-    # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
+        cell = cell_at(mouse)
 
-    move = None
+        # Check for a right-click to toggle flagging
+        if event.button == 3 and not lost:
+            if cell is not None and cell not in revealed:
+                if cell in flags:
+                    flags.remove(cell)
+                else:
+                    flags.add(cell)
+                dirty.add(cell)
+                status = True
 
-    left, _, right = pygame.mouse.get_pressed()
+        elif event.button != 1:
+            continue
 
-    # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
-
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
-
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move.")
-            else:
-                print("AI making safe move.")
-            time.sleep(0.2)
+        # If AI button clicked, ask the AI for a move
+        elif aiButton.collidepoint(mouse):
+            if not lost and not thinking:
+                jobs.put((ai, None))
+                thinking = True
+                status = True
 
         # Reset game state
         elif resetButton.collidepoint(mouse):
-            game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            game, ai = new_game()
             revealed = set()
             flags = set()
             lost = False
-            continue
+            thinking = False
+            redraw = True
 
         # User-made move
-        elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
-
-    # Make move and update AI knowledge
+        elif (not lost and not thinking and cell is not None
+                and cell not in flags and cell not in revealed):
+            move = cell
+
+    # Take the AI's move once it has one
+    try:
+        moveAI, aiMove, aiMines = results.get_nowait()
+    except queue.Empty:
+        pass
+    else:
+        if moveAI is ai:
+            thinking = False
+            status = True
+            if aiMove is None:
+                dirty |= flags ^ aiMines
+                flags = aiMines
+            else:
+                move = aiMove
+
+    # Make move and let the AI learn from it in the background
     if move:
         if game.is_mine(move):
             lost = True
+            dirty |= game.mines
         else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            revealedCells = game.reveal(move)
+            revealed.update(cell for cell, _ in revealedCells)
+            dirty.update(cell for cell, _ in revealedCells)
+
+            # Flags on cells the flood fill revealed were wrong
+            flags -= revealed
+            jobs.put((ai, revealedCells))
+        status = True
+
+    # Draw everything on the first frame of a game, then what changed
+    if redraw:
+        screen.fill(BLACK)
+        for i in range(HEIGHT):
+            for j in range(WIDTH):
+                draw_cell((i, j))
+        draw_button(aiButton, "AI Move")
+        draw_button(resetButton, "Reset")
+        draw_status()
+        pygame.display.flip()
+    elif dirty or status:
+        rects = [draw_cell(cell) for cell in dirty]
+        if status:
+            rects.append(draw_status())
+        pygame.display.update(rects)
 
-    pygame.display.flip()
+    clock.tick(FPS)
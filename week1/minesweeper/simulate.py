@@ -0,0 +1,219 @@
+import argparse
+import base64
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def play(height, width, mines, seed, inference="subset", log=None):
+    """
+    Plays one game with the AI and no display.
+    Returns whether the AI won, and how long each of its moves took.
+
+    The game and the AI are both seeded with `seed`, so a game can be
+    played again from its seed alone. If `log` is a file, the game's
+    moves are written to it, as described in play_from.
+    """
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(height=height, width=width, total_mines=mines,
+                       inference=inference, seed=seed)
+    if log is not None:
+        log.write(json.dumps({
+            "height": height,
+            "width": width,
+            "mines": mines,
+            "seed": seed,
+            "inference": inference,
+        }) + "\n")
+    won, times, _ = play_from(game, ai, mines, log=log)
+    return won, times
+
+
+def play_from(game, ai, mines, move=0, log=None):
+    """
+    Plays a game on from its `move`th move. Returns whether the AI won,
+    how long each of its moves took, and the cells it moved to.
+
+    If `log` is a file, a JSON line is written to it for every move,
+    with the move's number, its cell, and snapshots of the game and
+    the AI from just before it, followed by a line with the result.
+    """
+    times = []
+    cells = []
+    while len(ai.moves_made) < ai.height * ai.width - mines:
+        if log is not None:
+            game_state, ai_state = game.snapshot(), ai.snapshot()
+
+        # Time choosing the move and learning from it together
+        start = time.perf_counter()
+        cell = ai.make_best_move()
+        lost = cell is None or game.is_mine(cell)
+        if not lost:
+            ai.add_knowledge_batch(game.reveal(cell))
+        times.append(time.perf_counter() - start)
+        cells.append(cell)
+
+        if log is not None:
+            log.write(json.dumps({
+                "move": move,
+                "cell": cell,
+                "game": base64.b64encode(game_state).decode(),
+                "ai": base64.b64encode(ai_state).decode(),
+            }) + "\n")
+        move += 1
+        if lost:
+            break
+    else:
+        lost = False
+
+    if log is not None:
+        log.write(json.dumps({"won": not lost, "moves": move}) + "\n")
+    return not lost, times, cells
+
+
+def read_log(path):
+    """
+    Reads a move log written by play.
+    Returns its header, its moves, and its result.
+    """
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    return lines[0], lines[1:-1], lines[-1]
+
+
+def resume(path, move, log=None):
+    """
+    Restores a logged game from just before its `move`th move and plays
+    it on. Returns whether the AI won, and the cells it moved to.
+    """
+    header, moves, _ = read_log(path)
+    if not 0 <= move < len(moves):
+        raise ValueError(f"{path} has no move {move}")
+    game = Minesweeper.restore(base64.b64decode(moves[move]["game"]))
+    ai = MinesweeperAI.restore(base64.b64decode(moves[move]["ai"]))
+    won, _, cells = play_from(game, ai, header["mines"], move, log=log)
+    return won, cells
+
+
+def play_all(args):
+    """
+    Plays a batch of games, for one worker process.
+    """
+    height, width, mines, seeds, inference = args
+    return [play(height, width, mines, seed, inference) for seed in seeds]
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of sorted values, by nearest rank.
+    """
+    if not values:
+        return None
+    rank = max(1, round(p / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def simulate(n_games, height=8, width=8, mines=8, seed=0, workers=None,
+             inference="subset"):
+    """
+    Plays `n_games` games, spread over `workers` processes, and returns
+    the win rate, moves per game and time per move.
+
+    Game i always gets the same seed for a given `seed`,
+    however the games are spread over workers.
+    """
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(64) for _ in range(n_games)]
+
+    start = time.perf_counter()
+    if workers is None or workers <= 1:
+        games = play_all((height, width, mines, seeds, inference))
+    else:
+        size = max(1, n_games // (workers * 4))
+        batches = [(height, width, mines, seeds[i:i + size], inference)
+                   for i in range(0, n_games, size)]
+        with ProcessPoolExecutor(workers) as executor:
+            games = [game for batch in executor.map(play_all, batches)
+                     for game in batch]
+    elapsed = time.perf_counter() - start
+
+    wins = sum(won for won, _ in games)
+    times = sorted(t for _, game_times in games for t in game_times)
+    return {
+        "games": n_games,
+        "height": height,
+        "width": width,
+        "mines": mines,
+        "seed": seed,
+        "inference": inference,
+        "wins": wins,
+        "win_rate": wins / n_games if n_games else None,
+        "moves_per_game": len(times) / n_games if n_games else None,
+        "mean_move_ms": 1000 * sum(times) / len(times) if times else None,
+        "p50_move_ms": 1000 * percentile(times, 50) if times else None,
+        "p90_move_ms": 1000 * percentile(times, 90) if times else None,
+        "p99_move_ms": 1000 * percentile(times, 99) if times else None,
+        "max_move_ms": 1000 * times[-1] if times else None,
+        "seconds": elapsed,
+        "losing_seeds": [s for s, (won, _) in zip(seeds, games) if not won],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the Minesweeper AI over many games.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--inference", default="subset",
+                        choices=["subset", "linear"])
+    parser.add_argument("--json", action="store_true",
+                        help="print results as JSON")
+    parser.add_argument("--record", type=int, metavar="SEED",
+                        help="play only the game with this seed")
+    parser.add_argument("--resume", metavar="LOG",
+                        help="play on a logged game from --move")
+    parser.add_argument("--move", type=int, default=0)
+    parser.add_argument("--log", help="file to write the move log to")
+    args = parser.parse_args()
+
+    # Play a single game, from its seed or from a move in its log
+    if args.record is not None or args.resume is not None:
+        log = open(args.log, "w") if args.log else None
+        try:
+            if args.resume is not None:
+                won, cells = resume(args.resume, args.move, log)
+                print(f"Moves from {args.move}: {cells}")
+            else:
+                won, _ = play(args.height, args.width, args.mines,
+                              args.record, args.inference, log)
+        finally:
+            if log is not None:
+                log.close()
+        print("Won" if won else "Lost")
+        return
+
+    results = simulate(args.games, args.height, args.width, args.mines,
+                       args.seed, args.workers, args.inference)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"Won {results['wins']} of {results['games']} games "
+          f"({100 * results['win_rate']:.1f}%)")
+    print(f"Moves per game: {results['moves_per_game']:.1f}")
+    print(f"Time per move: mean {results['mean_move_ms']:.3f} ms, "
+          f"p50 {results['p50_move_ms']:.3f} ms, "
+          f"p90 {results['p90_move_ms']:.3f} ms, "
+          f"p99 {results['p99_move_ms']:.3f} ms, "
+          f"max {results['max_move_ms']:.3f} ms")
+    print(f"Total: {results['seconds']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
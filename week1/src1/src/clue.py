@@ -21,32 +21,33 @@ symbols = characters + rooms + weapons
 
 
 def check_knowledge(knowledge):
+    answers = KnowledgeBase(knowledge).query_all(symbols)
     for symbol in symbols:
-        if model_check(knowledge, symbol):
+        if answers[symbol] == YES:
             termcolor.cprint(f"{symbol}: YES", "green")
-        elif not model_check(knowledge, Not(symbol)):
+        elif answers[symbol] == MAYBE:
             print(f"{symbol}: MAYBE")
 
 
 # There must be a person, room, and weapon.
-knowledge = And(
+knowledge = [
     Or(mustard, plum, scarlet),
     Or(ballroom, kitchen, library),
     Or(knife, revolver, wrench)
-)
+]
 
 # Initial cards
-knowledge.add(And(
+knowledge.append(And(
     Not(mustard), Not(kitchen), Not(revolver)
 ))
 
 # Unknown card
-knowledge.add(Or(
+knowledge.append(Or(
     Not(scarlet), Not(library), Not(wrench)
 ))
 
 # Known cards
-knowledge.add(Not(plum))
-knowledge.add(Not(ballroom))
+knowledge.append(Not(plum))
+knowledge.append(Not(ballroom))
 
-check_knowledge(knowledge)
+check_knowledge(And(*knowledge))
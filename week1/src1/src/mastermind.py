@@ -6,11 +6,11 @@ for i in range(4):
     for color in colors:
         symbols.append(Symbol(f"{color}{i}"))
 
-knowledge = And()
+knowledge = []
 
 # Each color has a position.
 for color in colors:
-    knowledge.add(Or(
+    knowledge.append(Or(
         Symbol(f"{color}0"),
         Symbol(f"{color}1"),
         Symbol(f"{color}2"),
@@ -22,7 +22,7 @@ for color in colors:
     for i in range(4):
         for j in range(4):
             if i != j:
-                knowledge.add(Implication(
+                knowledge.append(Implication(
                     Symbol(f"{color}{i}"), Not(Symbol(f"{color}{j}"))
                 ))
 
@@ -31,11 +31,11 @@ for i in range(4):
     for c1 in colors:
         for c2 in colors:
             if c1 != c2:
-                knowledge.add(Implication(
+                knowledge.append(Implication(
                     Symbol(f"{c1}{i}"), Not(Symbol(f"{c2}{i}"))
                 ))
 
-knowledge.add(Or(
+knowledge.append(Or(
     And(Symbol("red0"), Symbol("blue1"), Not(Symbol("green2")), Not(Symbol("yellow3"))),
     And(Symbol("red0"), Symbol("green2"), Not(Symbol("blue1")), Not(Symbol("yellow3"))),
     And(Symbol("red0"), Symbol("yellow3"), Not(Symbol("blue1")), Not(Symbol("green2"))),
@@ -44,13 +44,16 @@ knowledge.add(Or(
     And(Symbol("green2"), Symbol("yellow3"), Not(Symbol("red0")), Not(Symbol("blue1")))
 ))
 
-knowledge.add(And(
+knowledge.append(And(
     Not(Symbol("blue0")),
     Not(Symbol("red1")),
     Not(Symbol("green2")),
     Not(Symbol("yellow3"))
 ))
 
+knowledge = And(*knowledge)
+
+answers = KnowledgeBase(knowledge).query_all(symbols)
 for symbol in symbols:
-    if model_check(knowledge, symbol):
+    if answers[symbol] == YES:
         print(symbol)
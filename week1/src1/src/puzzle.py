@@ -5,7 +5,7 @@ houses = ["Gryffindor", "Hufflepuff", "Ravenclaw", "Slytherin"]
 
 symbols = []
 
-knowledge = And()
+knowledge = []
 
 for person in people:
     for house in houses:
@@ -13,7 +13,7 @@ for person in people:
 
 # Each person belongs to a house.
 for person in people:
-    knowledge.add(Or(
+    knowledge.append(Or(
         Symbol(f"{person}Gryffindor"),
         Symbol(f"{person}Hufflepuff"),
         Symbol(f"{person}Ravenclaw"),
@@ -25,7 +25,7 @@ for person in people:
     for h1 in houses:
         for h2 in houses:
             if h1 != h2:
-                knowledge.add(
+                knowledge.append(
                     Implication(Symbol(f"{person}{h1}"), Not(Symbol(f"{person}{h2}")))
                 )
 
@@ -34,22 +34,24 @@ for house in houses:
     for p1 in people:
         for p2 in people:
             if p1 != p2:
-                knowledge.add(
+                knowledge.append(
                     Implication(Symbol(f"{p1}{house}"), Not(Symbol(f"{p2}{house}")))
                 )
 
-knowledge.add(
+knowledge.append(
     Or(Symbol("GilderoyGryffindor"), Symbol("GilderoyRavenclaw"))
 )
 
-knowledge.add(
+knowledge.append(
     Not(Symbol("PomonaSlytherin"))
 )
 
-knowledge.add(
+knowledge.append(
     Symbol("MinervaGryffindor")
 )
 
+knowledge = And(*knowledge)
+
 for symbol in symbols:
     if model_check(knowledge, symbol):
         print(symbol)
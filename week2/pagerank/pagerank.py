@@ -1,16 +1,44 @@
+import json
 import os
+import posixpath
 import random
 import re
+import struct
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
 
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 0.001
+
+# Links out of each page, cached in the corpus directory
+CACHE = ".links.json"
+
+# Characters read from a page at a time
+CHUNK_SIZE = 1 << 16
+
+# Fewest pages to parse before crawl uses more than one process
+PARALLEL_PAGES = 1000
+
+# Graph files: magic, pages, links and bytes of page names, followed by
+# int64 name offsets, int64 link offsets, int32 targets and the names
+GRAPH_MAGIC = b"GRAPH\x01"
+GRAPH_HEADER = struct.Struct("<6sxxQQQ")
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
 
 
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if os.path.isfile(sys.argv[1]):
+        corpus = load_graph(sys.argv[1])
+    else:
+        corpus = crawl(sys.argv[1])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -21,31 +49,286 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=None, cache=CACHE):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    Pages are parsed in `workers` processes, by default one per CPU once
+    there are enough of them. The links found are kept in the file
+    `cache` in the directory, by page name, size and modification time,
+    so unchanged pages are not parsed again. Pass None to not cache.
     """
-    pages = dict()
+    cache_path = os.path.join(directory, cache) if cache else None
+    cached = read_cache(cache_path) if cache_path else dict()
+
+    # Parse only pages that are new or changed since they were cached
+    keys = dict()
+    links = dict()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".html") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            keys[entry.name] = [stat.st_mtime_ns, stat.st_size]
+            if cached.get(entry.name, [None])[:2] == keys[entry.name]:
+                links[entry.name] = cached[entry.name][2]
+    stale = [filename for filename in keys if filename not in links]
+
+    paths = [os.path.join(directory, filename) for filename in stale]
+    if workers is None:
+        workers = os.cpu_count() if len(stale) >= PARALLEL_PAGES else 1
+    if workers <= 1:
+        parsed = list(map(page_links, paths))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            parsed = list(executor.map(
+                page_links, paths,
+                chunksize=max(1, len(paths) // (workers * 4))
+            ))
+    links.update(zip(stale, parsed))
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    if cache_path and (stale or len(cached) != len(links)):
+        write_cache(cache_path, {filename: keys[filename] + [links[filename]]
+                                 for filename in keys})
 
     # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
+    return {
+        filename: set(
+            link for link in page
+            if link in links and link != filename
+        )
+        for filename, page in links.items()
+    }
+
+
+def read_cache(path):
+    """
+    Return the entries of a link cache, [mtime, size, links] by page
+    name, leaving out any that are malformed. A cache that is missing
+    or unreadable is treated as empty.
+    """
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+    if not isinstance(cached, dict):
+        return dict()
+    return {
+        filename: entry for filename, entry in cached.items()
+        if isinstance(entry, list) and len(entry) == 3
+        and all(isinstance(n, int) for n in entry[:2])
+        and isinstance(entry[2], list)
+        and all(isinstance(link, str) for link in entry[2])
+    }
+
+
+def write_cache(path, entries):
+    """
+    Write the entries of a link cache, replacing the old cache only once
+    the new one is complete. Directories that cannot be written to are
+    left without a cache.
+    """
+    try:
+        fd, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".",
+            prefix=os.path.basename(path), suffix=".tmp"
+        )
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(temporary, path)
+    except OSError:
+        os.remove(temporary)
+
+
+def read_chunks(path, size=CHUNK_SIZE):
+    """
+    Yield the text of a file `size` characters at a time.
+    """
+    with open(path) as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+def page_links(path):
+    """
+    Return the pages a page links to, in the order first linked, read
+    a chunk at a time so that whole pages are never held in memory.
+    """
+    links = dict()
+    rest = ""
+    for chunk in read_chunks(path):
+
+        # Leave the last tag for the next chunk, where it may end
+        text = rest + chunk
+        cut = text.rfind("<")
+        if cut < 0:
+            cut = len(text)
+        for link in LINK.findall(text, 0, cut):
+            link = normalize_link(link)
+            if link is not None:
+                links[link] = None
+        rest = text[cut:]
+    for link in LINK.findall(rest):
+        link = normalize_link(link)
+        if link is not None:
+            links[link] = None
+    return list(links)
+
+
+def normalize_link(link):
+    """
+    Return the page a relative link points to, without any "./",
+    query or fragment, or None if it leaves the corpus directory.
+    """
+    parts = urlsplit(link)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = posixpath.normpath(unquote(parts.path))
+    if "/" in path or path in (".", ".."):
+        return None
+    return path
+
+
+class Graph():
+    """
+    Corpus as a compressed sparse row (CSR) adjacency over page ids.
+    Page i is named pages[i], and links to the pages
+    targets[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, pages, offsets, targets, path=None):
+        self.pages = pages
+        self.offsets = offsets
+        self.targets = targets
+
+        # File the graph was loaded from, if any
+        self.path = path
+
+    def __reduce__(self):
+        # Graphs from files reopen the file rather than copy the arrays
+        if self.path is not None:
+            return load_graph, (self.path,)
+        return Graph, (self.pages, self.offsets, self.targets)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Return the graph of a corpus dictionary, numbering its pages
+        in sorted order.
+        """
+        pages = sorted(corpus)
+        ids = {page: i for i, page in enumerate(pages)}
+        degrees = np.fromiter((len(corpus[page]) for page in pages),
+                              dtype=np.int64, count=len(pages))
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        targets = np.fromiter(
+            (ids[link] for page in pages for link in sorted(corpus[page])),
+            dtype=np.int32, count=int(offsets[-1])
         )
+        return cls(pages, offsets, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def degrees(self):
+        """
+        Return the number of links out of every page.
+        """
+        return np.diff(self.offsets)
+
+
+class PageNames():
+    """
+    Page names of a graph file, decoded from its string table
+    only when they are looked up.
+    """
+
+    def __init__(self, offsets, names):
+        self.offsets = offsets
+        self.names = names
 
-    return pages
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return bytes(self.names[start:end]).decode()
+
+    def __iter__(self):
+        offsets = self.offsets.tolist()
+        names = memoryview(self.names)
+        for start, end in zip(offsets, offsets[1:]):
+            yield bytes(names[start:end]).decode()
+
+
+def export_graph(corpus, path):
+    """
+    Write a corpus, as a dictionary or a Graph, to a binary graph file.
+    """
+    graph = to_graph(corpus)
+    names = [page.encode() for page in graph.pages]
+    name_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in names], out=name_offsets[1:])
+    with open(path, "wb") as f:
+        f.write(GRAPH_HEADER.pack(GRAPH_MAGIC, len(names),
+                                  len(graph.targets), int(name_offsets[-1])))
+        f.write(name_offsets.tobytes())
+        f.write(np.asarray(graph.offsets, dtype=np.int64).tobytes())
+        f.write(np.asarray(graph.targets, dtype=np.int32).tobytes())
+        for name in names:
+            f.write(name)
+
+
+def load_graph(path):
+    """
+    Return the Graph in a binary graph file. Its arrays are mapped from
+    the file read-only rather than read, so processes opening the same
+    file share its memory.
+    """
+    with open(path, "rb") as f:
+        header = f.read(GRAPH_HEADER.size)
+    if len(header) < GRAPH_HEADER.size:
+        raise ValueError(f"{path} is not a graph file")
+    magic, num_pages, num_links, num_bytes = GRAPH_HEADER.unpack(header)
+    if magic != GRAPH_MAGIC:
+        raise ValueError(f"{path} is not a graph file")
+
+    def mapped(dtype, count, offset):
+        # numpy.memmap cannot map zero bytes
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset,
+                         shape=(count,))
+
+    offset = GRAPH_HEADER.size
+    name_offsets = mapped(np.int64, num_pages + 1, offset)
+    offset += 8 * (num_pages + 1)
+    offsets = mapped(np.int64, num_pages + 1, offset)
+    offset += 8 * (num_pages + 1)
+    targets = mapped(np.int32, num_links, offset)
+    offset += 4 * num_links
+    names = mapped(np.uint8, num_bytes, offset)
+    return Graph(PageNames(name_offsets, names), offsets, targets, path)
+
+
+def to_graph(corpus):
+    """
+    Return a corpus as a Graph, whether it is one already or
+    a dictionary mapping each page to the pages it links to.
+    """
+    if isinstance(corpus, Graph):
+        return corpus
+    return Graph.from_corpus(corpus)
 
 
 def transition_model(corpus, page, damping_factor):
@@ -99,7 +382,7 @@ def transition_model(corpus, page, damping_factor):
                                               
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -107,17 +390,30 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Each step takes constant time: with probability `damping_factor`
+    it picks one of the current page's links out of the corpus graph,
+    and otherwise (or if there are none) any page. Runs with the same
+    `seed` sample the same pages.
     """
-  
-    page_rank = {key : 0 for key in corpus.keys()}#initialize a dict key = page value = 0
-    curr_page = random.choice(list(corpus.keys()))#initialize the first page
-    page_rank[curr_page] += 1/n
-    for _ in range(n-2):
-        next_candidates = list(transition_model(corpus, curr_page, damping_factor).keys())
-        next_prob = list(transition_model(corpus, curr_page, damping_factor).values())
-        next_page = random.choices(next_candidates, next_prob, k=1)#choose a next page randomly
-        page_rank[next_page[0]] += 1/n
-        curr_page = next_page[0]# move pointer
+    graph = to_graph(corpus)
+    num_pages = len(graph)
+    offsets = memoryview(graph.offsets)
+    targets = memoryview(graph.targets)
+    rng = random.Random(seed)
+    random_number = rng.random
+
+    counts = [0] * num_pages
+    curr_page = int(random_number() * num_pages)#initialize the first page
+    for _ in range(n):
+        counts[curr_page] += 1
+        start = offsets[curr_page]
+        num_links = offsets[curr_page + 1] - start
+        if num_links and random_number() < damping_factor:
+            curr_page = targets[start + int(random_number() * num_links)]
+        else:
+            curr_page = int(random_number() * num_pages)
+    page_rank = {page: count / n for page, count in zip(graph.pages, counts)}
     #test
     if abs(sum(list(page_rank.values())) - 1) <= 0.001:
         print("passed test")
@@ -147,7 +443,75 @@ def sample_pagerank(corpus, damping_factor, n):
     # return page_occur
 
 
-def iterate_pagerank(corpus, damping_factor):
+def sample_pagerank_batched(corpus, damping_factor, n, walkers=1000,
+                            batches=20, burn_in=50, seed=None):
+    """
+    Return PageRank values for each page by sampling about `n` pages
+    with `walkers` random surfers moving at once, and a 95% confidence
+    interval for each value.
+
+    Return two dictionaries keyed by page name: the estimated PageRank
+    values, which sum to 1, and (low, high) bounds on each of them.
+
+    Every surfer starts at a random page and takes `burn_in` steps
+    before its pages are counted. The surfers are split into `batches`
+    groups whose estimates are independent, and the intervals come
+    from how much the groups' estimates vary.
+    """
+    graph = to_graph(corpus)
+    num_pages = len(graph)
+    offsets = np.asarray(graph.offsets)
+    targets = np.asarray(graph.targets)
+    degrees = np.diff(offsets)
+    rng = np.random.default_rng(seed)
+
+    steps = max(1, -(-n // walkers))
+    batches = max(1, min(batches, walkers))
+
+    # Count pages by batch, as batch * num_pages + page
+    batch_of = (np.arange(walkers) % batches) * num_pages
+    counts = np.zeros(batches * num_pages, dtype=np.int64)
+
+    # Collect about a million visits at a time before counting them
+    chunk = max(1, (1 << 20) // walkers)
+    visits = np.empty((chunk, walkers), dtype=np.int64)
+
+    pages = rng.integers(num_pages, size=walkers, dtype=np.int32)
+    for step in range(-burn_in, steps):
+        if step >= 0:
+            visits[step % chunk] = batch_of + pages
+            if step % chunk == chunk - 1 or step == steps - 1:
+                counted = visits[:step % chunk + 1].ravel()
+                counts += np.bincount(counted, minlength=counts.size)
+
+        # Follow a link with probability `damping_factor`, if there is one
+        num_links = degrees[pages]
+        follow = (rng.random(walkers) < damping_factor) & (num_links > 0)
+        picks = (rng.random(walkers) * num_links).astype(np.int64)
+        linked = targets[offsets[pages[follow]] + picks[follow]]
+        pages = rng.integers(num_pages, size=walkers, dtype=np.int32)
+        pages[follow] = linked
+
+    counts = counts.reshape(batches, num_pages)
+    samples = steps * np.bincount(np.arange(walkers) % batches)
+    estimates = counts.sum(axis=0) / (steps * walkers)
+    if batches > 1:
+        spread = (counts / samples[:, None]).std(axis=0, ddof=1)
+        margins = 1.96 * spread / np.sqrt(batches)
+    else:
+        margins = np.full(num_pages, np.inf)
+
+    page_rank = dict(zip(graph.pages, estimates.tolist()))
+    intervals = {
+        page: (low, high) for page, low, high in zip(
+            graph.pages, (estimates - margins).tolist(),
+            (estimates + margins).tolist()
+        )
+    }
+    return page_rank, intervals
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -155,35 +519,36 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Each iteration is one sparse matrix-vector product over the
+    corpus graph. Pages without links are treated as linking to every
+    page, and iteration stops once the ranks change by less than
+    `tolerance` in total (L1 norm).
     """
-    
-    num_pages = len(list(corpus.keys()))
-    page_rank = {page: 1/num_pages for page in corpus}  #initialize
-    incoming_links = {page: [] for page in corpus} #initialize a reverse dictionary
-    for key in list(corpus.keys()):
-        for value in list(corpus[key]):
-            incoming_links[value].append(key)
-        
-
-    converged = False
-
-    while not converged:
-        converged = True
-        new_dict = {}
-        for key in page_rank:#loop over each page
-            val_1 = (1-damping_factor)/num_pages
-            sum_pages = 0 
-            for page_linked in incoming_links[key]:#pages that links to this page
-                num_links = len(list(corpus[page_linked]))
-                if num_links == 0:#if no outgoing links
-                    num_links = num_pages
-                sum_pages += page_rank[page_linked]/num_links
-            new_pr = val_1+ damping_factor* sum_pages
-            new_dict[key] = new_pr
-            if abs(new_pr - page_rank[key])>=0.001:
-                converged = False
-        page_rank = new_dict
-    return page_rank
+    graph = to_graph(corpus)
+    num_pages = len(graph)
+    degrees = graph.degrees()
+    dangling = degrees == 0
+    sources = np.repeat(np.arange(num_pages, dtype=np.int32), degrees)
+    targets = graph.targets
+
+    # Share of its rank that each page passes along each of its links
+    share = np.zeros(num_pages)
+    linked = ~dangling
+
+    page_rank = np.full(num_pages, 1 / num_pages)
+    while True:
+        share[linked] = page_rank[linked] / degrees[linked]
+        incoming = np.bincount(targets, weights=share[sources],
+                               minlength=num_pages)
+        spread = page_rank[dangling].sum() / num_pages
+        new_rank = ((1 - damping_factor) / num_pages
+                    + damping_factor * (incoming + spread))
+        change = np.abs(new_rank - page_rank).sum()
+        page_rank = new_rank
+        if change < tolerance:
+            break
+    return dict(zip(graph.pages, page_rank.tolist()))
 
 
 